@@ -0,0 +1,95 @@
+"""
+Responses consolidated per second by threshold_agreement and majority_vote over a ResponseSet,
+against calling the example consolidate_result handler once per task, and checks that
+threshold_agreement accepts or extends every task the way the handler does.
+
+    PYTHONPATH=. python benchmarks/consolidation_bench.py
+"""
+
+import random
+import time
+
+from task_assembly.consolidation import ResponseSet, majority_vote, threshold_agreement
+
+TASK_COUNTS = (100_000, 1_000_000)
+CHOICES = ["a", "A ", "b", "c", " C", "1", "22"]
+
+
+def consolidate_result(event, context):
+    """
+    The example consolidation handler, from the legacy example in
+    task_assembly/example/handlers.py
+    """
+    scored_values = {}
+    for response in event.get("Responses"):
+        value = str(response["Result"]["value"]).lower().strip()
+        if not value.isnumeric():
+            scored_values[value] = scored_values.get(value, 0) + 1
+    for response, score in scored_values.items():
+        if score >= 2:
+            return {"value": response}
+    return {"extend": True}
+
+
+def generate(task_count):
+    rng = random.Random(0)
+    task_ids = []
+    values = []
+    for i in range(task_count):
+        for _ in range(rng.randint(1, 5)):
+            task_ids.append(f"t{i}")
+            values.append(rng.choice(CHOICES))
+    return task_ids, values
+
+
+def handler_loop(task_ids, values):
+    events = {}
+    for task_id, value in zip(task_ids, values):
+        events.setdefault(task_id, []).append({"Result": {"value": value}})
+    return {
+        task_id: consolidate_result({"Responses": responses}, None)
+        for task_id, responses in events.items()
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    for task_count in TASK_COUNTS:
+        task_ids, values = generate(task_count)
+        count = len(values)
+        print(f"{task_count:,} tasks, {count:,} responses")
+
+        expected, elapsed = timed(handler_loop, task_ids, values)
+        print(f"{'handler per task':>28}: {count / elapsed / 1e6:6.2f}M responses/s")
+
+        #   The handler skips numeric values, so they cast no vote here either
+        responses, encode_elapsed = timed(
+            lambda: ResponseSet.from_arrays(
+                task_ids, values, ignore=lambda value: value.isnumeric()
+            )
+        )
+        print(
+            f"{'encode ResponseSet':>28}: {count / encode_elapsed / 1e6:6.2f}M responses/s"
+        )
+        for label, policy in (
+            ("threshold_agreement", threshold_agreement),
+            ("majority_vote", majority_vote),
+        ):
+            consolidation, elapsed = timed(policy, responses)
+            print(
+                f"{label:>28}: {count / elapsed / 1e6:6.2f}M responses/s, "
+                f"{count / (elapsed + encode_elapsed) / 1e6:6.2f}M/s with encoding"
+            )
+            if policy is threshold_agreement:
+                if dict(consolidation.results()) != expected:
+                    raise Exception("threshold_agreement differs from the handler")
+        print("threshold_agreement results match the handler")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Requests per second through the client's shared connection pool against a new connection for
+every request, served by a local stand-in for the service. A local server has no TLS
+handshake or network latency, so the gap against the real endpoint is larger than shown.
+
+    PYTHONPATH=. python benchmarks/pool_bench.py
+"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from task_assembly.client import AssemblyClient
+
+REQUESTS = 2000
+THREADS = 8
+BODY = json.dumps({"Batches": []}).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    #   Headers and body are written separately, which stalls on delayed ACKs with Nagle on
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def client(endpoint, **kwargs):
+    client = AssemblyClient("key", **kwargs)
+    client.ENDPOINT = endpoint
+    return client
+
+
+def run(server, label, get):
+    for threads in (1, THREADS):
+        server.connections = 0
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(lambda _: get(), range(REQUESTS)))
+        rate = REQUESTS / (time.perf_counter() - start)
+        print(
+            f"{label:>24}, {threads} thread(s): {rate:8,.0f} requests/s, "
+            f"{server.connections} connections"
+        )
+
+
+def main():
+    server = Server()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    pooled = client(endpoint)
+    run(server, "pooled client", pooled.get_batches)
+    unpooled = client(endpoint, keep_alive=False)
+    run(server, "client without keep-alive", unpooled.get_batches)
+    run(
+        server,
+        "requests.get per call",
+        lambda: requests.get(endpoint + "/batch").json(),
+    )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compares building request parameters with the compiled request_params builders against the
+legacy _arg_decorator/_map_parameters approach, single threaded and from 8 threads, and counts
+calls whose parameters leaked from another thread.
+
+    PYTHONPATH=. python benchmarks/request_params_bench.py
+"""
+
+import threading
+import time
+
+from task_assembly.utils import BLUEPRINT_DEFINITION_ARG_MAP, request_params
+
+CALLS = 200_000
+THREADS = 8
+
+
+def _arg_decorator(function):
+    def inner(*args, **kwargs):
+        inner.actual_kwargs = kwargs
+        return function(*args, **kwargs)
+
+    return inner
+
+
+def _map_parameters(parameters, actual_kwargs, key_map):
+    result = {}
+    for k, i in key_map.items():
+        if k in parameters and (parameters[k] is not None or k in actual_kwargs):
+            result[i] = parameters[k]
+    return result
+
+
+class LegacyClient:
+    @_arg_decorator
+    def update_blueprint(
+        self,
+        name=None,
+        state=None,
+        title=None,
+        description=None,
+        keywords=None,
+        assignment_duration_seconds=None,
+        lifetime_seconds=None,
+        default_assignments=None,
+        max_assignments=None,
+        default_team_id=None,
+        template_uri=None,
+        instructions_uri=None,
+        result_template_uri=None,
+        response_template_uri=None,
+        account_id=None,
+        blueprint_id=None,
+    ):
+        return _map_parameters(
+            locals(), self.update_blueprint.actual_kwargs, BLUEPRINT_DEFINITION_ARG_MAP
+        )
+
+
+class CompiledClient:
+    @request_params(BLUEPRINT_DEFINITION_ARG_MAP)
+    def update_blueprint(
+        self,
+        name=None,
+        state=None,
+        title=None,
+        description=None,
+        keywords=None,
+        assignment_duration_seconds=None,
+        lifetime_seconds=None,
+        default_assignments=None,
+        max_assignments=None,
+        default_team_id=None,
+        template_uri=None,
+        instructions_uri=None,
+        result_template_uri=None,
+        response_template_uri=None,
+        account_id=None,
+        blueprint_id=None,
+        *,
+        params,
+    ):
+        return params
+
+
+def single_threaded(client):
+    start = time.perf_counter()
+    for i in range(CALLS):
+        client.update_blueprint(blueprint_id="bp", title="title", state=None)
+    return CALLS / (time.perf_counter() - start)
+
+
+def threaded(client):
+    leaks = []
+
+    def run(n):
+        for i in range(CALLS // THREADS):
+            #   Odd threads pass state=None, which must only be sent by them
+            if n % 2:
+                params = client.update_blueprint(title=f"{n}", state=None)
+                leaked = "state" not in params
+            else:
+                params = client.update_blueprint(title=f"{n}")
+                leaked = "state" in params
+            if leaked:
+                leaks.append(n)
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(THREADS)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return CALLS / (time.perf_counter() - start), len(leaks)
+
+
+def main():
+    for label, client in (("legacy", LegacyClient()), ("compiled", CompiledClient())):
+        rate = single_threaded(client)
+        threaded_rate, leaks = threaded(client)
+        print(
+            f"{label:>8}: {rate:,.0f} calls/s, {threaded_rate:,.0f} calls/s from "
+            f"{THREADS} threads, {leaks} leaked parameter sets"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Peak Python memory, measured with tracemalloc, while a batch file is uploaded as a streamed
+MultipartFileBody and as a body joined in memory the way the legacy prepare_file_upload built
+it. The upload is sent with requests to a local stand-in for the presigned S3 POST endpoint.
+
+    PYTHONPATH=. python benchmarks/upload_memory_bench.py
+"""
+
+import os
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from task_assembly.utils import PRESIGNED_POST_FIELDS, prepare_file_upload
+
+FILE_SIZES_MB = (3, 30)
+LINE = b'{"Data": {"text": "' + b"x" * 80 + b'"}}\n'
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        remaining = int(self.headers["Content-Length"])
+        while remaining:
+            remaining -= len(self.rfile.read(min(remaining, 64 * 1024)))
+        self.send_response(204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_file(directory, size_mb):
+    file_name = os.path.join(directory, f"batch-{size_mb}mb.jsonl")
+    with open(file_name, "wb") as fp:
+        for _ in range(size_mb * 1024 * 1024 // len(LINE)):
+            fp.write(LINE)
+    return file_name
+
+
+def measure(send):
+    tracemalloc.start()
+    try:
+        send()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    post_response = {
+        "url": {
+            "url": f"http://127.0.0.1:{server.server_address[1]}/",
+            "fields": {field: "value" for field in PRESIGNED_POST_FIELDS},
+        }
+    }
+    session = requests.Session()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in FILE_SIZES_MB:
+            file_name = write_file(directory, size_mb)
+
+            def streamed():
+                upload = prepare_file_upload(post_response, file_name)
+                with upload["body"] as body:
+                    session.post(
+                        upload["url"], data=body, headers=upload["headers"]
+                    ).raise_for_status()
+
+            def in_memory():
+                upload = prepare_file_upload(post_response, file_name)
+                with upload["body"] as body, open(file_name, "rb") as fp:
+                    data = body._preamble + fp.read() + body._epilogue
+                session.post(
+                    upload["url"], data=data, headers=upload["headers"]
+                ).raise_for_status()
+
+            for label, send in (("streamed", streamed), ("in memory", in_memory)):
+                peak = measure(send)
+                print(
+                    f"{size_mb:>3} MB file, {label:>9}: peak {peak / 1024 / 1024:6.1f} MB"
+                )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
-import importlib.metadata
-from .client import AssemblyClient
+def __getattr__(name):
+    #   The clients pull in requests and aiohttp, so they are only loaded when used. This
+    #   keeps the CLI's daemon forwarding path free of them.
+    if name == "AssemblyClient":
+        from .client import AssemblyClient
 
-try:
-    __version__ = importlib.metadata.version("task-assembly")
-except importlib.metadata.PackageNotFoundError:
-    __version__ = "local"
+        return AssemblyClient
+    if name == "AsyncAssemblyClient":
+        from .async_client import AsyncAssemblyClient
+
+        return AsyncAssemblyClient
+    if name == "__version__":
+        import importlib.metadata
+
+        try:
+            return importlib.metadata.version("task-assembly")
+        except importlib.metadata.PackageNotFoundError:
+            return "local"
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
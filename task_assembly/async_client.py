@@ -0,0 +1,218 @@
+import asyncio
+import json
+import uuid
+
+from apiclient.error_handlers import ErrorHandler
+from apiclient.response import Response
+
+from .auth import AsyncTokenProvider
+from .client import AssemblyClient
+from .utils import (
+    BLUEPRINT_DEFINITION_ARG_MAP,
+    BLUEPRINT_ASSET_DEFINITION_ARG_MAP,
+    TASK_DEFINITION_ARG_MAP,
+    BATCH_DEFINITION_ARG_MAP,
+    request_params,
+)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+DEFAULT_MAX_CONCURRENCY = 100
+DEFAULT_REQUEST_TIMEOUT = 10.0
+
+
+class _AiohttpResponse(Response):
+    """
+    Adapts an aiohttp response so the apiclient ErrorHandler raises the same exceptions as the
+    synchronous client
+    """
+
+    def __init__(self, response, text):
+        self._response = response
+        self._text = text
+
+    def get_original(self):
+        return self._response
+
+    def get_status_code(self):
+        return self._response.status
+
+    def get_raw_data(self):
+        return self._text
+
+    def get_json(self):
+        return json.loads(self._text)
+
+    def get_status_reason(self):
+        return self._response.reason or ""
+
+    def get_requested_url(self):
+        return str(self._response.url)
+
+
+class AsyncAssemblyClient:
+    """
+    asyncio version of AssemblyClient for the blueprint, batch and task calls.
+
+    At most max_concurrency requests are in flight at once, the rest wait on a semaphore, and
+    connections are pooled by a single aiohttp connector. Use it as an async context manager or
+    call close() when done.
+    """
+
+    ENDPOINT = AssemblyClient.ENDPOINT
+
+    def __init__(
+        self,
+        api_key,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        limit_per_host=0,
+        request_timeout=DEFAULT_REQUEST_TIMEOUT,
+        token_provider: AsyncTokenProvider = None,
+    ):
+        if aiohttp is None:
+            raise Exception(
+                "The async client requires aiohttp, install it with 'pip install task-assembly[async]'"
+            )
+        self.max_concurrency = max_concurrency
+        self.limit_per_host = limit_per_host
+        self.request_timeout = request_timeout
+        self.token_provider = token_provider or AsyncTokenProvider()
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        self.token_provider.close()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_concurrency, limit_per_host=self.limit_per_host
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            )
+            self.token_provider.set_session(self._session)
+        return self._session
+
+    async def _request(self, method, url, data=None, params=None, headers=None):
+        session = self._get_session()
+        request_headers = {"Content-type": "application/json"}
+        if headers:
+            request_headers.update(headers)
+        body = json.dumps(data) if data is not None else None
+        async with self._semaphore:
+            async with session.request(
+                method, url, data=body, params=params, headers=request_headers
+            ) as response:
+                text = await response.text()
+        if response.status >= 300:
+            raise ErrorHandler.get_exception(_AiohttpResponse(response, text))
+        return json.loads(text) if text else None
+
+    async def get_token(self):
+        self._get_session()
+        return await self.token_provider.get_token()
+
+    @request_params(BATCH_DEFINITION_ARG_MAP)
+    async def create_batch(self, blueprint_id, account_id, input_key=None, *, params):
+        url = self.ENDPOINT + "/batch"
+        return await self._request("POST", url, data=params)
+
+    async def get_batches(self):
+        url = self.ENDPOINT + "/batch"
+        return await self._request("GET", url)
+
+    @request_params(TASK_DEFINITION_ARG_MAP)
+    async def create_task(self, blueprint_id, team_id, *, params):
+        url = self.ENDPOINT + "/task"
+        return await self._request("POST", url, data=params)
+
+    async def get_tasks(self):
+        url = self.ENDPOINT + "/task"
+        return await self._request("GET", url)
+
+    @request_params(BLUEPRINT_DEFINITION_ARG_MAP)
+    async def create_blueprint(
+        self,
+        name,
+        state=None,
+        title=None,
+        description=None,
+        keywords=None,
+        assignment_duration_seconds=None,
+        lifetime_seconds=None,
+        default_assignments=None,
+        max_assignments=None,
+        default_team_id=None,
+        template_uri=None,
+        instructions_uri=None,
+        result_template_uri=None,
+        response_template_uri=None,
+        *,
+        params,
+    ):
+        url = self.ENDPOINT + "/blueprint"
+        params["accountId"] = str(uuid.uuid4())
+        return await self._request("POST", url, data=params)
+
+    async def get_blueprint(self, id):
+        url = self.ENDPOINT + f"/blueprint/{id}"
+        headers = {"accept": "application/json"}
+        return await self._request("GET", url, headers=headers)
+
+    async def get_blueprints(self):
+        url = f"{self.ENDPOINT}/blueprint"
+        response = await self.get_token()
+
+        if "error" in response:
+            raise Exception(f"Authentication Exception - {response['error']}")
+
+        headers = {
+            "accept": "application/json",
+            "Authorization": f'Bearer {response["token"]}',
+        }
+        return await self._request("GET", url, headers=headers)
+
+    @request_params(BLUEPRINT_DEFINITION_ARG_MAP)
+    async def update_blueprint(
+        self,
+        name=None,
+        state=None,
+        title=None,
+        description=None,
+        keywords=None,
+        assignment_duration_seconds=None,
+        lifetime_seconds=None,
+        default_assignments=None,
+        max_assignments=None,
+        default_team_id=None,
+        template_uri=None,
+        instructions_uri=None,
+        result_template_uri=None,
+        response_template_uri=None,
+        account_id=None,
+        blueprint_id=None,
+        *,
+        params,
+    ):
+        url = self.ENDPOINT + f"/blueprint/{blueprint_id}"
+        return await self._request("PUT", url, data=params)
+
+    @request_params(BLUEPRINT_ASSET_DEFINITION_ARG_MAP)
+    async def create_blueprint_asset(self, blueprint_id, name, kb=0, *, params):
+        url = self.ENDPOINT + "/blueprint_asset"
+        return await self._request("POST", url, data=params)
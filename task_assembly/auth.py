@@ -0,0 +1,254 @@
+import asyncio
+import os
+import threading
+import time
+
+from .utils import load_yaml, remove_file
+
+# TODO - CLIENT_ID has to come from a url - so we can change it
+CLIENT_ID = "yQMDigaAK60R0iJamI6wowr9PhlZOGDS"
+OAUTH_DOMAIN = "dev-ta5favhgjjiu5swh.us.auth0.com"
+REFRESH_TOKEN_LEWAY = 10
+
+TOKEN_URL = f"https://{OAUTH_DOMAIN}/oauth/token"
+TOKEN_HEADERS = {"content-type": "application/x-www-form-urlencoded"}
+
+
+class TokenProvider:
+    """
+    Keeps the OAuth access token in memory so that authenticated calls don't touch the disk or
+    the OAuth server. token.yaml is read once and written back after each refresh so that other
+    processes can pick up the token.
+
+    The token is refreshed on a background timer REFRESH_TOKEN_LEWAY seconds before it expires,
+    and callers that find a stale token share a single refresh rather than each calling
+    /oauth/token.
+    """
+
+    def __init__(
+        self,
+        session,
+        token_file="token.yaml",
+        login_file="login.yaml",
+        background_refresh=True,
+    ):
+        self._session = session
+        self.token_file = token_file
+        self.login_file = login_file
+        self.background_refresh = background_refresh
+        self._token = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def get_token(self):
+        """
+        Returns {"token": <access_token>} or {"error": <reason>}
+        """
+        token = self._token
+        if token is not None and time.time() < self._refresh_at(token):
+            return {"token": token["access_token"]}
+        return self._refresh(token)
+
+    def reset(self):
+        """
+        Drops the in-memory token, used when a new login is started
+        """
+        with self._lock:
+            self._cancel_timer()
+            self._token = None
+            self._loaded = True
+
+    def close(self):
+        self._cancel_timer()
+
+    def _refresh(self, stale, force=False):
+        with self._lock:
+            # Another caller completed the refresh while we were waiting for the lock
+            if not force and self._token is not stale:
+                current = self._token
+                if current is not None and time.time() < self._refresh_at(current):
+                    return {"token": current["access_token"]}
+            response, data = self._prepare_refresh(force)
+            if response is not None:
+                return response
+            svc_response = self._session.post(
+                TOKEN_URL, headers=TOKEN_HEADERS, data=data
+            )
+            return self._accept(svc_response.json())
+
+    def _prepare_refresh(self, force=False):
+        """
+        Decides how the token needs to be obtained. Returns a (response, None) tuple when no call
+        is needed, otherwise (None, data) with the form data for the /oauth/token call.
+        """
+        if not self._loaded:
+            self._loaded = True
+            if os.path.isfile(self.token_file):
+                self._token = load_yaml(self.token_file)
+                self._schedule(self._token)
+
+        #   Reference from here - https://github.com/mlcommons/medperf/blob/main/cli/medperf/comms/auth/auth0.py#L198
+        token = self._token
+        if token is not None:
+            absolute_expiration = token["token_issued_at"] + token["expires_in"]
+            current_time = time.time()
+
+            if not force and current_time < absolute_expiration - REFRESH_TOKEN_LEWAY:
+                return {"token": token["access_token"]}, None
+
+            if current_time > absolute_expiration:
+                print("Token expired - please login again")
+                self._token = None
+                remove_file(self.token_file)
+                return {"error": "token expired"}, None
+
+            print("using refresh token")
+            return None, {
+                "client_id": CLIENT_ID,
+                "grant_type": "refresh_token",
+                "refresh_token": token["refresh_token"],
+            }
+
+        login_yaml = load_yaml(self.login_file)
+        print("requesting new token")
+        return None, {
+            "client_id": CLIENT_ID,
+            "device_code": login_yaml["device_code"],
+            "grant_type": "urn:ietf:params:oauth:grant-type:device_code",
+        }
+
+    def _accept(self, json_response):
+        """
+        Stores a successful /oauth/token response in memory and in the token file
+        """
+        json_response["token_issued_at"] = time.time()
+
+        # TODO - Add better error messages from dave
+        if "error" in json_response:
+            _print_token_error(json_response)
+            return {"error": json_response["error"]}
+
+        # Refresh responses only include a refresh token when rotation is enabled
+        if "refresh_token" not in json_response and self._token:
+            json_response["refresh_token"] = self._token.get("refresh_token")
+        self._token = json_response
+        import yaml
+
+        with open(self.token_file, "w") as fp:
+            yaml.dump(json_response, fp)
+        self._schedule(json_response)
+        return {"token": json_response["access_token"]}
+
+    @staticmethod
+    def _refresh_at(token):
+        return token["token_issued_at"] + token["expires_in"] - REFRESH_TOKEN_LEWAY
+
+    def _schedule(self, token):
+        if not self.background_refresh or not token.get("refresh_token"):
+            return
+        self._cancel_timer()
+        delay = max(self._refresh_at(token) - time.time(), 0)
+        self._timer = threading.Timer(delay, self._background_refresh, args=(token,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _background_refresh(self, token):
+        try:
+            self._refresh(token, force=self._token is token)
+        except Exception as exception:
+            print(f"Background token refresh failed - {exception}")
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+def _print_token_error(json_response):
+    error = json_response["error"]
+    if error == "authorization_pending":
+        print(
+            f"Error during get_token - Auth Pending - {json_response['error_description']}"
+        )
+    elif error == "slow_down":
+        print(
+            f"Error during get_token - Too many requests - {json_response['error_description']}"
+        )
+    elif error == "expired_token":
+        print(
+            f"Error during get_token - Expired Token - {json_response['error_description']}"
+        )
+    elif error == "access_denied":
+        print(
+            f"Error during get_token - Access Denied - {json_response['error_description']}"
+        )
+    elif error == "invalid_grant":
+        print(
+            f"Invalid or expired device code - use cli with login to generate device code\n"
+        )
+    else:
+        print(f"Error during get_token - {json_response}")
+
+
+class AsyncTokenProvider(TokenProvider):
+    """
+    TokenProvider for the asyncio client, the refresh goes through an aiohttp session and the
+    single-flight lock and background refresh run on the event loop instead of threads.
+    """
+
+    def __init__(
+        self,
+        session=None,
+        token_file="token.yaml",
+        login_file="login.yaml",
+        background_refresh=True,
+    ):
+        super().__init__(session, token_file, login_file, background_refresh)
+        self._async_lock = None
+
+    def set_session(self, session):
+        self._session = session
+
+    async def get_token(self):
+        token = self._token
+        if token is not None and time.time() < self._refresh_at(token):
+            return {"token": token["access_token"]}
+        return await self._refresh(token)
+
+    async def _refresh(self, stale, force=False):
+        # Created lazily so the lock belongs to the loop that is running the client
+        if self._async_lock is None:
+            self._async_lock = asyncio.Lock()
+        async with self._async_lock:
+            if not force and self._token is not stale:
+                current = self._token
+                if current is not None and time.time() < self._refresh_at(current):
+                    return {"token": current["access_token"]}
+            response, data = self._prepare_refresh(force)
+            if response is not None:
+                return response
+            async with self._session.post(
+                TOKEN_URL, headers=TOKEN_HEADERS, data=data
+            ) as svc_response:
+                json_response = await svc_response.json(content_type=None)
+            return self._accept(json_response)
+
+    def _schedule(self, token):
+        if not self.background_refresh or not token.get("refresh_token"):
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._cancel_timer()
+        delay = max(self._refresh_at(token) - time.time(), 0)
+        self._timer = loop.call_later(
+            delay, lambda: loop.create_task(self._background_refresh(token))
+        )
+
+    async def _background_refresh(self, token):
+        try:
+            await self._refresh(token, force=self._token is token)
+        except Exception as exception:
+            print(f"Background token refresh failed - {exception}")
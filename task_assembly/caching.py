@@ -0,0 +1,320 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlencode
+
+from .utils import remove_file
+
+
+def default_cache_dir() -> Path:
+    return Path.home().joinpath(".taskassembly")
+
+
+def _write_json(path: Path, data, mode=0o644):
+    """
+    Writes the file atomically so a concurrent reader never sees a partial file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    #   A unique temporary file per write, so concurrent writers never share one
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.chmod(tmp, mode)
+        with os.fdopen(fd, "w") as fp:
+            json.dump(data, fp)
+        os.replace(tmp, path)
+    except BaseException:
+        remove_file(tmp)
+        raise
+
+
+def _read_json(path: Path, default):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return default
+
+
+class UploadCache:
+    """
+    Content-addressed index of batch files that have already been uploaded. Objects are keyed
+    by the sha256 of the source content, which is computed while the upload streams, and record
+    the compression they were uploaded with.
+
+    Files are also indexed by path, size and modification time so an unchanged file can be
+    matched to its hash without reading it again. A file that isn't indexed, or has changed
+    since, is hashed so that the same content at another path or after a touch still matches.
+    """
+
+    #   Shared by every instance, so concurrent create_batch ops in one process don't
+    #   overwrite each other's changes to the index
+    _lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_cache_dir().joinpath("uploads.json")
+        self._data = None
+
+    def _load(self):
+        if self._data is None:
+            self._data = _read_json(self.path, {})
+            self._data.setdefault("objects", {})
+            self._data.setdefault("files", {})
+        return self._data
+
+    @staticmethod
+    def _file_entry(file_name):
+        stat = os.stat(file_name)
+        return os.path.abspath(file_name), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _hash_file(file_name):
+        hasher = hashlib.sha256()
+        with open(file_name, "rb") as fp:
+            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def lookup(self, file_name, encoding=None):
+        """
+        Returns the cached upload for the file's content, a dict with sha256, key, url, encoding
+        and uploaded, or None if that content hasn't been uploaded with that encoding
+        """
+        with self._lock:
+            self._data = None
+            data = self._load()
+            path, size, mtime_ns = self._file_entry(file_name)
+            entry = data["files"].get(path)
+            if entry and entry["size"] == size and entry["mtime_ns"] == mtime_ns:
+                sha256 = entry["sha256"]
+            elif not data["objects"]:
+                return None
+            else:
+                sha256 = self._hash_file(file_name)
+                if sha256 in data["objects"]:
+                    data["files"][path] = {
+                        "size": size,
+                        "mtime_ns": mtime_ns,
+                        "sha256": sha256,
+                    }
+                    _write_json(self.path, data)
+        uploaded = data["objects"].get(sha256)
+        if not uploaded or uploaded.get("encoding") != encoding:
+            return None
+        return {"sha256": sha256, **uploaded}
+
+    def record(self, file_name, sha256, key, url, encoding=None):
+        with self._lock:
+            #   Reread the index so entries recorded since it was loaded are kept
+            self._data = None
+            data = self._load()
+            path, size, mtime_ns = self._file_entry(file_name)
+            data["files"][path] = {"size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+            data["objects"][sha256] = {
+                "key": key,
+                "url": url,
+                "encoding": encoding,
+                "uploaded": time.time(),
+            }
+            _write_json(self.path, data)
+
+
+#   States after which a batch or task no longer changes
+TERMINAL_STATES = frozenset({"Complete", "Completed", "Expired", "Stopped", "Error"})
+DEFAULT_RESPONSE_TTL = 30
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class ResponseCache:
+    """
+    Cache for GET responses, held in an in-memory LRU and mirrored to one file per entry under
+    ~/.taskassembly/responses so it survives between CLI invocations.
+
+    Entries are served without a request for ttl seconds, after which they are revalidated with
+    If-None-Match/If-Modified-Since. Responses for a single object in a terminal state, such as
+    a finished batch, never go stale, while lists and pages always do. Each tier keeps at most max_entries, evicting the
+    least recently used. With persist=False entries are only held in memory.
+    """
+
+    def __init__(
+        self,
+        path=None,
+        ttl=DEFAULT_RESPONSE_TTL,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        terminal_states=TERMINAL_STATES,
+        persist=True,
+    ):
+        self.path = Path(path) if path else default_cache_dir().joinpath("responses")
+        self.persist = persist
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.terminal_states = terminal_states
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_count = None
+
+    @staticmethod
+    def key(url, params=None):
+        if params:
+            return f"{url}?{urlencode(sorted(params.items()))}"
+        return url
+
+    def _file(self, key) -> Path:
+        return self.path.joinpath(hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+        if not self.persist:
+            return None
+        file = self._file(key)
+        entry = _read_json(file, None)
+        if entry is None or entry.get("key") != key:
+            return None
+        os.utime(file)
+        self._remember(key, entry)
+        return entry
+
+    def is_fresh(self, entry):
+        return entry["permanent"] or time.time() - entry["stored"] < self.ttl
+
+    def put(self, key, body, etag=None, last_modified=None):
+        entry = {
+            "key": key,
+            "body": body,
+            "etag": etag,
+            "last_modified": last_modified,
+            "permanent": self._is_terminal(body),
+            "stored": time.time(),
+        }
+        self._remember(key, entry)
+        self._save(key, entry)
+        return entry
+
+    def touch(self, key, entry):
+        """
+        Marks a revalidated entry as fresh again
+        """
+        entry["stored"] = time.time()
+        self._remember(key, entry)
+        self._save(key, entry)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.persist:
+            remove_file(self._file(key))
+
+    def _is_terminal(self, body):
+        """
+        Only a single object can be final. Lists and pages always expire, since new items can
+        appear in them even when every item they hold is finished.
+        """
+        return (
+            isinstance(body, dict)
+            and (body.get("State") or body.get("state")) in self.terminal_states
+        )
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _save(self, key, entry):
+        if not self.persist:
+            return
+        file = self._file(key)
+        if self._disk_count is None:
+            self._disk_count = len(list(self.path.glob("*.json")))
+        if not file.exists():
+            self._disk_count += 1
+        _write_json(file, entry, mode=0o600)
+        if self._disk_count > self.max_entries:
+            files = sorted(self.path.glob("*.json"), key=lambda f: f.stat().st_mtime)
+            for old in files[: len(files) - self.max_entries]:
+                remove_file(old)
+            self._disk_count = min(len(files), self.max_entries)
+
+
+class BlueprintSnapshots:
+    """
+    Last-synced definition of each blueprint, stored as one file per blueprint under
+    ~/.taskassembly/snapshots, so update_blueprint can send only the fields that changed.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_cache_dir().joinpath("snapshots")
+
+    def _file(self, blueprint_id) -> Path:
+        return self.path.joinpath(f"{blueprint_id}.json")
+
+    def load(self, blueprint_id):
+        return _read_json(self._file(blueprint_id), None)
+
+    def save(self, blueprint_id, definition):
+        _write_json(self._file(blueprint_id), definition)
+
+    @staticmethod
+    def diff(snapshot, definition):
+        """
+        Returns the fields of definition whose values differ from the snapshot
+        """
+        return {
+            key: value
+            for key, value in definition.items()
+            if key not in snapshot or snapshot[key] != value
+        }
+
+
+DEFAULT_SECRET_TTL = 3600
+
+
+class SecretCache:
+    """
+    Values resolved from Secrets Manager, kept in ~/.taskassembly/secrets.json with 0600
+    permissions so that load_config doesn't call AWS on every invocation. Values are reused for
+    ttl seconds and should be invalidated when the API rejects them.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_SECRET_TTL):
+        self.path = Path(path) if path else default_cache_dir().joinpath("secrets.json")
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(secret_id, scope):
+        return f"{scope}/{secret_id}" if scope else secret_id
+
+    def get(self, secret_id, fetch, ttl=None, scope=None):
+        """
+        Returns the cached value for secret_id, calling fetch(secret_id) when there is no entry
+        or it is older than the ttl. Entries are kept apart by scope, e.g. the config profile,
+        since the same secret name can hold different values in different AWS accounts.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        key = self._key(secret_id, scope)
+        data = _read_json(self.path, {})
+        entry = data.get(key)
+        if entry and time.time() - entry["stored"] < ttl:
+            return entry["value"]
+        value = fetch(secret_id)
+        if ttl > 0:
+            data[key] = {"value": value, "stored": time.time()}
+            _write_json(self.path, data, mode=0o600)
+        return value
+
+    def invalidate(self, secret_id=None, scope=None):
+        if secret_id is None:
+            remove_file(self.path)
+            return
+        data = _read_json(self.path, {})
+        if data.pop(self._key(secret_id, scope), None) is not None:
+            _write_json(self.path, data, mode=0o600)
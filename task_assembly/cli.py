@@ -1,3 +1,6 @@
+import csv
+import hashlib
+import heapq
 import itertools
 import json
 import time
@@ -5,26 +8,48 @@ import os.path
 import posixpath
 import sys
 from pathlib import Path
-from pkg_resources import resource_filename
 import shutil
-from datetime import datetime
-from .utils import prepare_file_upload, load_yaml
+from collections import deque
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+from .utils import (
+    BATCH_FIELDS,
+    BLUEPRINT_DEFINITION_ARG_MAP,
+    COMPRESSION_TYPES,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_POOL_MAXSIZE,
+    batch_row,
+    check_compression,
+    prepare_file_upload,
+    load_yaml,
+)
 
-import larry as lry
 import argparse
-import toml
-import yaml
 
-from .client import AssemblyClient
+from .caching import (
+    BlueprintSnapshots,
+    ResponseCache,
+    SecretCache,
+    UploadCache,
+    default_cache_dir,
+)
+
+#   The client imports apiclient and requests, which the daemon forwarding path doesn't need
+if TYPE_CHECKING:
+    from .client import AssemblyClient
 
 #   General guidelines
 #   snake case for cli
 
+#   Set to 1 (or a socket path) to send commands to a running 'task-assembly daemon'
+DAEMON_ENV = "TASK_ASSEMBLY_DAEMON"
+
 
 class CLI:
 
-    def __init__(self, client: AssemblyClient):
+    def __init__(self, client: "AssemblyClient"):
         self.client = client
+        self.snapshots = BlueprintSnapshots()
         self.delimiter_map = {
             "tsv": "\t",
             "csv": ",",
@@ -32,12 +57,16 @@ class CLI:
         }
 
     def example(self):
+        from pkg_resources import resource_filename
+
         files = ["batch.csv", "gold.json", "handlers.py", "template.html"]
         for file in files:
             shutil.copy(resource_filename(__name__, f"example/{file}"), os.getcwd())
         print(f"The files {files} have been added to the current directory")
 
     def migrate_yaml(self, definition_file="definition.json"):
+        import yaml
+
         base_name = os.path.splitext(definition_file)[0]
         yaml_name = f"{base_name}.yaml"
         with open(definition_file) as fp:
@@ -48,27 +77,342 @@ class CLI:
             f"The file {definition_file} has been migrated to {yaml_name}, you may delete the original json file"
         )
 
-    def create_batch(self, blueprint_id=None, account_id=None, file_path=None):
+    def create_batch(
+        self,
+        blueprint_id=None,
+        account_id=None,
+        file_path=None,
+        reuse_upload=False,
+        compress=None,
+    ):
+        if compress:
+            #   Fail before the batch is created rather than leave it without its input
+            check_compression(compress)
         params = {"blueprint_id": blueprint_id, "account_id": account_id}
+        upload_cache = UploadCache()
+        #   A lookup can hash the whole file, so it's only done when reuse was asked for
+        cached = (
+            upload_cache.lookup(file_path, encoding=compress) if reuse_upload else None
+        )
+        if cached:
+            params["input_key"] = cached["key"]
         task = self.client.create_batch(**params)
         print(json.dumps(task, indent=4))
 
+        #   The service only returns an upload url when it needs the file
+        if "input_key" in params and "url" not in task:
+            print(
+                f"File {file_path} was already uploaded as {cached['key']}, skipping upload"
+            )
+            return
+
         print(f"Uploading file {file_path} for batch")
 
-        f_dict = prepare_file_upload(task, file_name=file_path)
-        requests.post(url=f_dict["url"], data=f_dict["body"], headers=f_dict["headers"])
+        hasher = hashlib.sha256()
+        f_dict = prepare_file_upload(
+            task, file_name=file_path, hasher=hasher, compression=compress
+        )
+        with f_dict["body"] as body:
+            if compress:
+                source_size = os.path.getsize(file_path)
+                print(
+                    f"Compressed {source_size} bytes to {body.file_size} bytes with {compress} "
+                    f"(ratio {source_size / max(body.file_size, 1):.1f}x)"
+                )
+            start = time.time()
+            response = self.client.get_session().post(
+                url=f_dict["url"], data=body, headers=f_dict["headers"]
+            )
+            elapsed = time.time() - start
+        response.raise_for_status()
+        upload_cache.record(
+            file_path,
+            hasher.hexdigest(),
+            task["url"]["fields"]["key"],
+            task["url"]["url"],
+            encoding=compress,
+        )
 
-        print(f"Uploaded file {file_path} for batch")
+        print(
+            f"Uploaded file {file_path} for batch, {len(body)} bytes in {elapsed:.1f}s "
+            f"({len(body) / max(elapsed, 1e-6) / 1e6:.1f} MB/s)"
+        )
 
     def get_batches(self):
         print(json.dumps(self.client.get_batches(), indent=4))
 
+    def get_batch_results(self, batch_id, output_file, columns=None):
+        from botocore.exceptions import ClientError
+        from .export import export_results, open_s3_lines
+
+        response = self.client.get_batch(batch_id)
+        if not response.get("OutputUri"):
+            print("The output file not yet available")
+            return
+        print(f"Retrieving results from: {response['OutputUri']}")
+        try:
+            lines = open_s3_lines(response["OutputUri"])
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                print("The output file not yet available")
+                return
+            raise e
+        count = export_results(
+            lines, output_file, columns.split(",") if columns else None
+        )
+        if count == 0:
+            print("No results yet")
+        else:
+            print(f"Wrote {count} results to {output_file}")
+
+    def watch(self, batch_ids, interval=None, max_interval=None, concurrency=None):
+        from .watch import watch_batches
+
+        kwargs = {
+            "min_interval": interval,
+            "max_interval": max_interval,
+            "concurrency": concurrency,
+        }
+        try:
+            watch_batches(
+                self.client,
+                batch_ids,
+                **{k: v for k, v in kwargs.items() if v is not None},
+            )
+        except KeyboardInterrupt:
+            pass
+
+    def mirror_sync(self, kinds=None, db=None):
+        from .mirror import SYNC_ORDER, Mirror
+
+        start = time.time()
+        with Mirror(db) as mirror:
+            results = mirror.sync(self.client, kinds or SYNC_ORDER)
+        for kind, (total, changed, removed) in results.items():
+            print(f"{kind}: {total} synced, {changed} changed, {removed} removed")
+        print(f"Mirror updated in {time.time() - start:.1f}s")
+
+    def mirror_query(
+        self,
+        kind,
+        state=None,
+        blueprint_id=None,
+        batch_id=None,
+        tag=None,
+        tag_value=None,
+        since=None,
+        limit=None,
+        output_file=None,
+        db=None,
+    ):
+        from .mirror import Mirror
+
+        with Mirror(db) as mirror:
+            items = mirror.query(
+                kind, state, blueprint_id, batch_id, tag, tag_value, since, limit
+            )
+        if output_file:
+            self._write_rows(items, output_file)
+        else:
+            print(json.dumps(items, indent=4))
+
+    def score_gold(self, gold_file, results_file, task_output=None, worker_output=None):
+        from .scoring import GoldSet
+
+        start = time.time()
+        records = self._read_records(results_file)
+        report = GoldSet.from_file(gold_file).score(records)
+        scored = report.scores[report.scored]
+        print(
+            f"Scored {len(scored)} of {len(records)} responses in {time.time() - start:.2f}s, "
+            f"average {scored.mean() if len(scored) else 0:.1f}"
+        )
+        if task_output:
+            self._write_rows(report.task_scores(), task_output)
+        workers = report.worker_scores()
+        if worker_output:
+            self._write_rows(workers, worker_output)
+        elif workers:
+            from tabulate import tabulate
+
+            print(tabulate(workers, headers="keys"))
+
+    def estimate_reliability(
+        self,
+        assignments_file,
+        task_output=None,
+        worker_output=None,
+        processes=None,
+        max_iterations=None,
+    ):
+        from .reliability import DEFAULT_MAX_ITERATIONS, estimate_reliability
+
+        start = time.time()
+        reliability = estimate_reliability(
+            self._read_records(assignments_file),
+            processes=processes,
+            max_iterations=max_iterations or DEFAULT_MAX_ITERATIONS,
+        )
+        print(
+            f"Estimated {len(reliability.workers)} workers over {len(reliability.tasks)} tasks "
+            f"in {reliability.iterations} iterations, {time.time() - start:.2f}s"
+        )
+        if task_output:
+            self._write_rows(reliability.task_labels(), task_output)
+        workers = reliability.worker_scores()
+        if worker_output:
+            self._write_rows(workers, worker_output)
+        elif workers:
+            from tabulate import tabulate
+
+            print(tabulate(workers, headers="keys"))
+
+    @staticmethod
+    def _read_records(file_name):
+        with open(file_name) as fp:
+            if file_name.lower().endswith(".jsonl"):
+                return [json.loads(line) for line in fp if line.strip()]
+            return json.load(fp)
+
+    def sync_results(self, batch_id, directory):
+        from botocore.exceptions import ClientError
+        from .export import sync_s3_lines
+
+        response = self.client.get_batch(batch_id)
+        if not response.get("OutputUri"):
+            print("The output file not yet available")
+            return
+        os.makedirs(directory, exist_ok=True)
+        local_file = os.path.join(directory, f"{batch_id}.jsonl")
+        checkpoint_file = os.path.join(directory, f".{batch_id}.sync.json")
+        try:
+            lines, size = sync_s3_lines(
+                response["OutputUri"], local_file, checkpoint_file
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                print("The output file not yet available")
+                return
+            raise e
+        if lines:
+            print(f"Appended {lines} results ({size} bytes) to {local_file}")
+        else:
+            print(f"{local_file} is up to date")
+
+    def list_batches(self, limit=None, since=None, output_file=None):
+        """
+        Lists the newest batches, keeping at most limit of them in a heap while paging. The
+        service doesn't return batches in any guaranteed order, so every page is read.
+        """
+        since = _parse_created(since) if since else None
+        heap = []
+        for seq, batch in enumerate(self.client.iter_batches()):
+            created = _parse_created(batch["Created"])
+            if since and created < since:
+                continue
+            if limit and len(heap) >= limit:
+                if created > heap[0][0]:
+                    heapq.heapreplace(heap, (created, seq, batch))
+            else:
+                heapq.heappush(heap, (created, seq, batch))
+
+        rows = []
+        for created, _, batch in sorted(heap, reverse=True):
+            row = batch_row(batch)
+            row["Created"] = created.strftime("%m/%d/%Y %H:%M")
+            rows.append(row)
+
+        if output_file:
+            self._write_rows(rows, output_file)
+        else:
+            from tabulate import tabulate
+
+            table = [list(row.values()) for row in rows]
+            print(tabulate(table, headers=list(BATCH_FIELDS.values())))
+
+    def _write_rows(self, rows, output_file):
+        ext = os.path.splitext(output_file)[1][1:].lower()
+        delimiter = self.delimiter_map.get(ext)
+        if ext == "jsonl":
+            with open(output_file, "w") as fp:
+                for row in rows:
+                    fp.write(json.dumps(row) + "\n")
+        elif ext == "json":
+            with open(output_file, "w") as fp:
+                json.dump(rows, fp)
+        elif delimiter:
+            with open(output_file, "w", newline="") as fp:
+                fieldnames = list(rows[0].keys()) if rows else []
+                writer = csv.DictWriter(fp, fieldnames=fieldnames, delimiter=delimiter)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            raise Exception(
+                "Output file must have an extension of json, jsonl, csv, tsv, or txt"
+            )
+
     def create_task(self, blueprint_id=None, team_id=None):
         params = {"blueprint_id": blueprint_id, "team_id": team_id}
         task = self.client.create_task(**params)
         print(task)
         print(json.dumps(task, indent=4))
 
+    def create_tasks(self, input_file, concurrency=DEFAULT_CONCURRENCY, report=None):
+        extension = os.path.splitext(input_file)[1][1:].lower()
+        delimiter = self.delimiter_map.get(extension)
+        if not delimiter:
+            raise Exception("Input file must have an extension of csv, tsv, or txt")
+        if not report:
+            report = f"{os.path.splitext(input_file)[0]}_report.csv"
+
+        pending = deque()
+        succeeded = 0
+        failed = 0
+        start = time.time()
+        with open(input_file, encoding="utf-8-sig", newline="") as in_fp, open(
+            report, "w", newline=""
+        ) as out_fp:
+            rows = csv.DictReader(in_fp, delimiter=delimiter)
+
+            def tasks():
+                for row in rows:
+                    item = {
+                        "blueprint_id": row.get("blueprint_id"),
+                        "team_id": row.get("team_id"),
+                    }
+                    pending.append(item)
+                    yield item
+
+            writer = csv.DictWriter(
+                out_fp,
+                fieldnames=[
+                    "row",
+                    "blueprint_id",
+                    "team_id",
+                    "success",
+                    "response",
+                    "error",
+                ],
+            )
+            writer.writeheader()
+            results = self.client.iter_create_tasks(tasks(), concurrency)
+            for index, result in enumerate(results, start=1):
+                row = {"row": index, **pending.popleft(), "success": result["success"]}
+                if result["success"]:
+                    succeeded += 1
+                    row["response"] = json.dumps(result["response"])
+                else:
+                    failed += 1
+                    row["error"] = result["error"]
+                writer.writerow(row)
+
+        elapsed = time.time() - start
+        print(
+            f"Created {succeeded} tasks, {failed} failed, in {elapsed:.1f}s "
+            f"({(succeeded + failed) / elapsed if elapsed else 0:.1f}/s)"
+        )
+        print(f"Results written to {report}")
+
     def create_blueprint(
         self,
         name,
@@ -116,10 +460,14 @@ class CLI:
         if response_template_uri:
             params["response_template_uri"] = response_template_uri
 
+        import yaml
+
         blueprint = self.client.create_blueprint(**params)
         print(blueprint)
+        definition = blueprint["created"]["attribute_values"]
         with open("definition.yaml", "w") as fp:
-            yaml.dump(blueprint["created"]["attribute_values"], fp)
+            yaml.dump(definition, fp)
+        self._save_snapshot(definition)
         print(json.dumps(blueprint, indent=4))
         print(
             f"Created Blueprint {blueprint['created']['attribute_values']['blueprint_id']} in definition.yaml"
@@ -127,20 +475,50 @@ class CLI:
 
     @staticmethod
     def read_definition(file_name):
+        import yaml
+
         with open(file_name, "r") as ffp:
             definition_ = yaml.safe_load(ffp)
         return definition_
 
+    @staticmethod
+    def _blueprint_fields(definition):
+        return {
+            key: value
+            for key, value in definition.items()
+            if key in BLUEPRINT_DEFINITION_ARG_MAP
+        }
+
+    def _save_snapshot(self, definition):
+        blueprint_id = definition.get("blueprint_id")
+        if blueprint_id:
+            self.snapshots.save(blueprint_id, self._blueprint_fields(definition))
+
     def update_blueprint(self, definition_file):
         definition = self.read_definition(definition_file)
-        self.client.update_blueprint(**definition)
-        print(f"Updated Blueprint {definition['blueprint_id']}")
+        blueprint_id = definition["blueprint_id"]
+        fields = self._blueprint_fields(definition)
+
+        #   Without a snapshot the server state is unknown, so every field is sent
+        snapshot = self.snapshots.load(blueprint_id)
+        changes = fields if snapshot is None else self.snapshots.diff(snapshot, fields)
+        if not changes:
+            print(f"Blueprint {blueprint_id} is up to date")
+            return
+
+        self.client.update_blueprint(blueprint_id=blueprint_id, **changes)
+        self.snapshots.save(blueprint_id, {**(snapshot or {}), **fields})
+        print(f"Updated Blueprint {blueprint_id} ({', '.join(sorted(changes))})")
 
     def get_blueprint(self, id, definition_file=None):
+        import yaml
+
         blueprint = self.client.get_blueprint(id)
         if definition_file:
             with open(definition_file, "w") as fp:
                 yaml.dump(blueprint, fp)
+            if isinstance(blueprint, dict):
+                self._save_snapshot({"blueprint_id": id, **blueprint})
         else:
             print(yaml.dump(blueprint))
 
@@ -165,11 +543,64 @@ class CLI:
         print(json.dumps(blueprint_asset, indent=4))
         print(f"Created Blueprint Asset")
 
+    def run(self, ops_file, concurrency=DEFAULT_CONCURRENCY, ordered=False):
+        from .script import iter_run_ops, read_ops
+
+        succeeded = 0
+        failed = 0
+        start = time.time()
+        for record in iter_run_ops(self, read_ops(ops_file), concurrency, ordered):
+            if record["ok"]:
+                succeeded += 1
+            else:
+                failed += 1
+            print(json.dumps(record), flush=True)
+        elapsed = time.time() - start
+        print(
+            f"Ran {succeeded + failed} ops ({failed} failed) in {elapsed:.1f}s",
+            file=sys.stderr,
+        )
+
     def login_flow(self):
         self.client.do_login()
 
 
-def load_config(ta_config, profile) -> str:
+def _parse_created(value):
+    """
+    Parses an ISO 8601 timestamp as an aware datetime, taking timestamps without an offset to
+    be UTC, so that --since and Created values always compare
+    """
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    created = datetime.fromisoformat(value)
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    return created
+
+
+def fetch_api_key_secret(secret_id, secrets_client=None) -> str:
+    """
+    Reads the api key from a Secrets Manager secret holding either the key itself or a JSON
+    object with an api_key field
+    """
+    if secrets_client is None:
+        import larry as lry
+
+        secrets_client = lry.session().client("secretsmanager")
+    response = secrets_client.get_secret_value(SecretId=secret_id)
+    secret_value = response["SecretString"]
+    try:
+        secrets = json.loads(secret_value)
+        return secrets["api_key"]
+    except:
+        return secret_value
+
+
+def load_config(
+    ta_config, profile, secret_cache: SecretCache = None, secrets_client=None
+) -> str:
+    import toml
+
     if not ta_config.exists():
         if os.path.exists("api-key.txt"):
             with open("api-key.txt") as fp:
@@ -184,31 +615,45 @@ def load_config(ta_config, profile) -> str:
         print(f"No configuration found for {profile} profile")
         exit(1)
     profile_credentials = profile_config["credentials"]
+    #   larry pulls in boto3, so it is only loaded for profiles that use AWS
     if profile_credentials.get("aws_profile"):
+        import larry as lry
+
         lry.set_session(profile_name=profile_credentials.get("aws_profile"))
     api_key = None
     if "api_key" in profile_credentials:
         api_key = profile_credentials.get("api_key")
     elif "api_key_secret" in profile_credentials:
-        sm = lry.session().client("secretsmanager")
-        response = sm.get_secret_value(SecretId=profile_credentials["api_key_secret"])
-        secret_value = response["SecretString"]
-        try:
-            secrets = json.loads(secret_value)
-            api_key = secrets["api_key"]
-        except:
-            api_key = secret_value
+        secret_id = profile_credentials["api_key_secret"]
+        fetch = lambda s: fetch_api_key_secret(s, secrets_client)
+        if secret_cache is None:
+            api_key = fetch(secret_id)
+        else:
+            api_key = secret_cache.get(
+                secret_id,
+                fetch,
+                ttl=profile_credentials.get("api_key_secret_ttl"),
+                scope=profile,
+            )
     return api_key
 
 
-def main():
+#   Commands handled by main itself rather than by a CLI method
+LOCAL_COMMANDS = {"configure", "shell", "daemon"}
+#   Commands that only read local files, so they run without a configuration or a client
+OFFLINE_COMMANDS = {CLI.mirror_query, CLI.score_gold, CLI.estimate_reliability}
+
+
+def build_parser():
     parser = argparse.ArgumentParser("Task Assembly CLI")
     parser.add_argument("--profile")
+    parser.add_argument("--cache", action="store_true")
     subparsers = parser.add_subparsers(dest="command", required=True)
 
     c_parser = subparsers.add_parser("configure")
     c_parser.add_argument("--key")
     c_parser.add_argument("--key_secret")
+    c_parser.add_argument("--key_secret_ttl", type=int)
     c_parser.add_argument("--aws_profile")
     c_parser.add_argument("--validate", action="store_true")
 
@@ -216,16 +661,84 @@ def main():
     cb_task.add_argument("--blueprint_id", type=str, required=True)
     cb_task.add_argument("--account_id", type=str, required=True)
     cb_task.add_argument("--file_path", type=str, required=True)
+    cb_task.add_argument("--reuse_upload", action="store_true")
+    cb_task.add_argument("--compress", choices=list(COMPRESSION_TYPES))
     cb_task.set_defaults(func=CLI.create_batch)
 
     gb_parser = subparsers.add_parser("get_batches")
     gb_parser.set_defaults(func=CLI.get_batches)
 
+    gbr_parser = subparsers.add_parser("get_batch_results")
+    gbr_parser.add_argument("batch_id", type=str)
+    gbr_parser.add_argument("output_file", type=str)
+    gbr_parser.add_argument("--columns", type=str)
+    gbr_parser.set_defaults(func=CLI.get_batch_results)
+
+    w_parser = subparsers.add_parser("watch")
+    w_parser.add_argument("batch_ids", type=str, nargs="+")
+    w_parser.add_argument("--interval", type=float)
+    w_parser.add_argument("--max_interval", type=float)
+    w_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    w_parser.set_defaults(func=CLI.watch)
+
+    m_parser = subparsers.add_parser("mirror")
+    m_subparsers = m_parser.add_subparsers(dest="mirror_command", required=True)
+    ms_parser = m_subparsers.add_parser("sync")
+    ms_parser.add_argument(
+        "--kinds", nargs="+", choices=["blueprints", "batches", "tasks"]
+    )
+    ms_parser.add_argument("--db", type=str)
+    ms_parser.set_defaults(func=CLI.mirror_sync)
+    mq_parser = m_subparsers.add_parser("query")
+    mq_parser.add_argument("kind", choices=["blueprints", "batches", "tasks"])
+    mq_parser.add_argument("--state", type=str)
+    mq_parser.add_argument("--blueprint_id", type=str)
+    mq_parser.add_argument("--batch_id", type=str)
+    mq_parser.add_argument("--tag", type=str)
+    mq_parser.add_argument("--tag_value", type=str)
+    mq_parser.add_argument("--since", type=str)
+    mq_parser.add_argument("--limit", type=int)
+    mq_parser.add_argument("--output_file", type=str)
+    mq_parser.add_argument("--db", type=str)
+    mq_parser.set_defaults(func=CLI.mirror_query)
+
+    sg_parser = subparsers.add_parser("score_gold")
+    sg_parser.add_argument("gold_file", type=str)
+    sg_parser.add_argument("results_file", type=str)
+    sg_parser.add_argument("--task_output", type=str)
+    sg_parser.add_argument("--worker_output", type=str)
+    sg_parser.set_defaults(func=CLI.score_gold)
+
+    er_parser = subparsers.add_parser("estimate_reliability")
+    er_parser.add_argument("assignments_file", type=str)
+    er_parser.add_argument("--task_output", type=str)
+    er_parser.add_argument("--worker_output", type=str)
+    er_parser.add_argument("--processes", type=int)
+    er_parser.add_argument("--max_iterations", type=int)
+    er_parser.set_defaults(func=CLI.estimate_reliability)
+
+    sr_parser = subparsers.add_parser("sync_results")
+    sr_parser.add_argument("batch_id", type=str)
+    sr_parser.add_argument("directory", type=str)
+    sr_parser.set_defaults(func=CLI.sync_results)
+
+    lb_parser = subparsers.add_parser("list_batches")
+    lb_parser.add_argument("--limit", type=int)
+    lb_parser.add_argument("--since", type=str)
+    lb_parser.add_argument("--output_file")
+    lb_parser.set_defaults(func=CLI.list_batches)
+
     c_task = subparsers.add_parser("create_task")
     c_task.add_argument("--blueprint_id", type=str, required=True)
     c_task.add_argument("--team_id", type=str, required=True)
     c_task.set_defaults(func=CLI.create_task)
 
+    cts_parser = subparsers.add_parser("create_tasks")
+    cts_parser.add_argument("--input", dest="input_file", type=str, required=True)
+    cts_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    cts_parser.add_argument("--report", type=str)
+    cts_parser.set_defaults(func=CLI.create_tasks)
+
     gt_parser = subparsers.add_parser("get_tasks")
     gt_parser.set_defaults(func=CLI.get_tasks)
 
@@ -267,15 +780,81 @@ def main():
     login_parser = subparsers.add_parser("login")
     login_parser.set_defaults(func=CLI.login_flow)
 
-    args = parser.parse_args()
+    r_parser = subparsers.add_parser("run")
+    r_parser.add_argument("ops_file", type=str)
+    r_parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    r_parser.add_argument("--ordered", action="store_true")
+    r_parser.set_defaults(func=CLI.run)
 
-    ta_dir = Path.home().joinpath(".taskassembly")
+    subparsers.add_parser("shell")
+
+    d_parser = subparsers.add_parser("daemon")
+    d_parser.add_argument("--socket", type=str)
+
+    return parser
+
+
+def create_client(args, api_key) -> "AssemblyClient":
+    from .client import AssemblyClient
+
+    # Keep a pooled connection for each worker of the bulk commands
+    pool_maxsize = max(DEFAULT_POOL_MAXSIZE, getattr(args, "concurrency", 0))
+    response_cache = ResponseCache() if args.cache else None
+    return AssemblyClient(
+        api_key, pool_maxsize=pool_maxsize, response_cache=response_cache
+    )
+
+
+def run_command(cli, args, secret_cache: SecretCache = None):
+    from apiclient.exceptions import APIRequestError
+
+    if getattr(args, "func", None):
+        arg_dict = dict(args._get_kwargs())
+        arg_dict.pop("func")
+        arg_dict.pop("command")
+        arg_dict.pop("profile")
+        arg_dict.pop("cache")
+        arg_dict.pop("mirror_command", None)
+        try:
+            args.func(cli, **arg_dict)
+        except APIRequestError as error:
+            #   A rejected key may have been rotated, resolve it again next time
+            if secret_cache and error.status_code in (401, 403):
+                secret_cache.invalidate()
+            raise
+    else:
+        raise Exception("Misformated command")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    #   Hand the command to a running daemon if one was requested, falling back to running it here
+    if os.environ.get(DAEMON_ENV):
+        from .shell import forward_to_daemon
+
+        exit_code = forward_to_daemon(argv, os.environ[DAEMON_ENV])
+        if exit_code is not None:
+            exit(exit_code)
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "func", None) in OFFLINE_COMMANDS:
+        run_command(CLI(None), args)
+        return
+
+    ta_dir = default_cache_dir()
     ta_config = ta_dir.joinpath("config.toml")
     profile = args.profile if args.profile else "default"
 
     if args.command == "configure" and (
-        args.key or args.key_secret or args.aws_profile
+        args.key
+        or args.key_secret
+        or args.key_secret_ttl is not None
+        or args.aws_profile
     ):
+        import toml
+
         ta_dir.mkdir(exist_ok=True)
         config = {"version": "0.1"}
         if ta_config.exists():
@@ -291,6 +870,8 @@ def main():
             creds["api_key"] = args.key
         if args.key_secret:
             creds["api_key_secret"] = args.key_secret
+        if args.key_secret_ttl is not None:
+            creds["api_key_secret_ttl"] = args.key_secret_ttl
         if args.aws_profile:
             creds["aws_profile"] = args.aws_profile
         with open(ta_config, "w") as fp:
@@ -298,23 +879,32 @@ def main():
         if not args.validate:
             exit(0)
 
-    api_key = load_config(ta_config, profile)
+    secret_cache = SecretCache(ta_dir.joinpath("secrets.json"))
+    api_key = load_config(ta_config, profile, secret_cache)
 
     if api_key is None:
         print("Missing api key value")
         exit(1)
 
-    client = AssemblyClient(api_key)
-    cli = CLI(client)
+    cli = CLI(create_client(args, api_key))
 
-    if args.func:
-        arg_dict = dict(args._get_kwargs())
-        arg_dict.pop("func")
-        arg_dict.pop("command")
-        arg_dict.pop("profile")
-        args.func(cli, **arg_dict)
+    if args.command == "shell":
+        from .shell import run_shell
+
+        run_shell(cli, parser, secret_cache)
+    elif args.command == "daemon":
+        from .shell import run_daemon, socket_path
+
+        run_daemon(
+            cli,
+            parser,
+            args.socket or socket_path(profile),
+            secret_cache,
+            profile=profile,
+            cache=args.cache,
+        )
     else:
-        raise Exception("Misformated command")
+        run_command(cli, args, secret_cache)
 
 
 """
@@ -338,6 +928,7 @@ from botocore.exceptions import ClientError
 from tabulate import tabulate
 
 from .client import AssemblyClient
+from .qualifications import QualificationProgress, assign_qualification, default_progress_path
 from .utils import REV_TASK_DEFINITION_ARG_MAP
 
 
@@ -630,22 +1221,25 @@ class CLI:
                    if w.get("ScoredCount", 0) >= min_tests
                    and w.get("Points") is not None
                    and w["Points"]/w["ScoredCount"] >= min_score]
-        print(f"Creating qualification for {len(workers)} workers")
-        qualification_id = lry.mturk.create_qualification_type(
-            f"Good {definition['DefinitionId']}",
-            f"Good {definition['DefinitionId']}"
-        )
+        progress = QualificationProgress(default_progress_path(definition["DefinitionId"]))
+        qualification_id = progress.qualification_id
+        if qualification_id:
+            print(f"Resuming qualification {qualification_id}, {len(progress.assigned)} workers already assigned")
+        else:
+            print(f"Creating qualification for {len(workers)} workers")
+            qualification_id = lry.mturk.create_qualification_type(
+                f"Good {definition['DefinitionId']}",
+                f"Good {definition['DefinitionId']}"
+            )
         print(f"Assigning workers to qualification {qualification_id}")
-        failures = []
-        for w in workers:
-            try:
-                lry.mturk.assign_qualification(qualification_id, w["WorkerId"], 1)
-            except ClientError:
-                failures.append(w["WorkerId"])
-        if failures:
-            print(f"Failed to add the following {len(failures)} workers to the qualification:")
-            for w in failures:
-                print(w)
+        report = assign_qualification(qualification_id, [w["WorkerId"] for w in workers],
+                                      progress=progress, out=sys.stdout)
+        print(f"Assigned {report.assigned} workers in {report.elapsed:.1f}s ({report.rate:.1f}/s), "
+              f"skipped {report.skipped} already assigned")
+        if report.failures:
+            print(f"Failed to add the following {len(report.failures)} workers to the qualification:")
+            for w, error in report.failures.items():
+                print(f"{w} - {error}")
         print(f"Adding qualification to definition")
         reqs = definition.get("QualificationRequirements", [])
         if reqs is None:
@@ -1,6 +1,8 @@
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
-import yaml
 import time, os
 
 from apiclient.authentication_methods import (
@@ -11,35 +13,59 @@ from apiclient import (
     JsonResponseHandler,
     JsonRequestFormatter,
 )
+from apiclient.exceptions import UnexpectedError
+from apiclient.response import RequestsResponse
+from requests.adapters import HTTPAdapter
+from .auth import (
+    CLIENT_ID,
+    OAUTH_DOMAIN,
+    REFRESH_TOKEN_LEWAY,
+    TOKEN_HEADERS,
+    TokenProvider,
+)
+from .caching import ResponseCache
 from .utils import (
     BLUEPRINT_DEFINITION_ARG_MAP,
     BLUEPRINT_ASSET_DEFINITION_ARG_MAP,
     TASK_DEFINITION_ARG_MAP,
     BATCH_DEFINITION_ARG_MAP,
+    DEFAULT_CONCURRENCY,
+    DEFAULT_POOL_CONNECTIONS,
+    DEFAULT_POOL_MAXSIZE,
     load_yaml,
     remove_file,
+    request_params,
 )
 
-from rich import print
-from rich.console import Console
-
-console = Console()
-
 # TODO: Fix this simplified approach for caching the client
 _client: "AssemblyClient" = None
 
-# TODO - CLIENT_ID has to come from a url - so we can change it
-CLIENT_ID = "yQMDigaAK60R0iJamI6wowr9PhlZOGDS"
-OAUTH_DOMAIN = "dev-ta5favhgjjiu5swh.us.auth0.com"
-REFRESH_TOKEN_LEWAY = 10
-
-
-def _arg_decorator(function):
-    def inner(*args, **kwargs):
-        inner.actual_kwargs = kwargs
-        return function(*args, **kwargs)
 
-    return inner
+def build_session(
+    pool_connections=DEFAULT_POOL_CONNECTIONS,
+    pool_maxsize=DEFAULT_POOL_MAXSIZE,
+    pool_block=False,
+    keep_alive=True,
+):
+    """
+    Builds a requests session backed by a single connection pool that is shared by every
+    call the client makes, including the calls to the OAuth endpoints.
+
+    pool_connections is the number of hosts to keep pools for and pool_maxsize is the number
+    of connections kept alive for each host. With pool_block set, callers wait for a free
+    connection instead of opening connections beyond pool_maxsize.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
 
 
 """
@@ -59,111 +85,81 @@ class AssemblyClient(APIClient):
     # a builder method to have the url would be appropriate
     ENDPOINT = "https://hksfuaaglfnusssl77miemahni0yepqj.lambda-url.us-west-2.on.aws"
 
-    def __init__(self, api_key):
+    def __init__(
+        self,
+        api_key,
+        pool_connections=DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize=DEFAULT_POOL_MAXSIZE,
+        pool_block=False,
+        keep_alive=True,
+        response_cache: ResponseCache = None,
+    ):
         global _client
         super().__init__(
             response_handler=JsonResponseHandler,
             request_formatter=JsonRequestFormatter,
         )
+        self.set_session(
+            build_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+        )
+        self.token_provider = TokenProvider(self.get_session())
+        self.response_cache = response_cache
         _client = self
 
-    # TODO - needs refactoring - lots of returns
     def get_token(self):
-        response = {}
-
-        print("\nGetting/Refreshing token...\n")
-        headers = {"content-type": "application/x-www-form-urlencoded"}
-
-        #   Check if same token can be used or we can refresh
-        #   Reference from here - https://github.com/mlcommons/medperf/blob/main/cli/medperf/comms/auth/auth0.py#L198
-        if os.path.isfile("token.yaml"):
-            token_yaml = load_yaml("token.yaml")
-            absolute_expiration = (
-                token_yaml["token_issued_at"] + token_yaml["expires_in"]
-            )
-            refresh_possible_expiration = absolute_expiration - REFRESH_TOKEN_LEWAY
-
-            current_time = time.time()
-
-            if current_time < refresh_possible_expiration:
-                print("Token unexpired - reusing")
-                response = {"token": token_yaml["access_token"]}
-
-                return response
-
-            if current_time > absolute_expiration:
-                print("Token expired - please login again")
-                os.remove("token.yaml")
-
-                response = {"error": "token expired"}
-
-                return response
-
-            print("using refresh token")
-            svc_response = requests.post(
-                f"https://{OAUTH_DOMAIN}/oauth/token",
-                headers=headers,
-                data={
-                    "client_id": ("%s" % CLIENT_ID),
-                    "grant_type": "refresh_token",
-                    "refresh_token": token_yaml["refresh_token"],
-                },
-            )
-        else:
-            login_yaml = load_yaml("login.yaml")
-
-            print("requesting new token")
-            svc_response = requests.post(
-                f"https://{OAUTH_DOMAIN}/oauth/token",
-                headers=headers,
-                data={
-                    "client_id": ("%s" % CLIENT_ID),
-                    "device_code": ("%s" % login_yaml["device_code"]),
-                    "grant_type": "urn:ietf:params:oauth:grant-type:device_code",
-                },
+        return self.token_provider.get_token()
+
+    def _cached_get(self, url, params=None, headers=None, response_cache=None):
+        """
+        GET through response_cache, or the client's response cache when one is configured. Fresh
+        entries are returned without a request, stale ones are revalidated with the stored
+        ETag/Last-Modified.
+        """
+        cache = response_cache or self.response_cache
+        if cache is None:
+            return self.get(url, params, headers=headers)
+
+        key = cache.key(url, params)
+        entry = cache.get(key)
+        if entry is not None and cache.is_fresh(entry):
+            return entry["body"]
+
+        request_headers = self.get_default_headers()
+        if headers:
+            request_headers.update(headers)
+        if entry is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = self.get_session().get(
+                url,
+                params=params,
+                headers=request_headers,
+                timeout=self.get_request_timeout(),
             )
-
-        json_response = svc_response.json()
-        json_response["token_issued_at"] = time.time()
-
-        # TODO - Add better error messages from dave
-        if "error" in json_response:
-            response["error"] = json_response["error"]
-
-            if json_response["error"] == "authorization_pending":
-                print(
-                    f"Error during get_token - Auth Pending - {json_response['error_description']}"
-                )
-            elif json_response["error"] == "slow_down":
-                print(
-                    f"Error during get_token - Too many requests - {json_response['error_description']}"
-                )
-            elif json_response["error"] == "expired_token":
-                print(
-                    f"Error during get_token - Expired Token - {json_response['error_description']}"
-                )
-            elif json_response["error"] == "access_denied":
-                print(
-                    f"Error during get_token - Access Denied - {json_response['error_description']}"
-                )
-            elif json_response["error"] == "invalid_grant":
-                print(
-                    f"Invalid or expired device code - use cli with login to generate device code\n"
-                )
-            else:
-                print(f"Error during get_token - {json_response}")
-        else:
-            with open("token.yaml", "w") as fp:
-                yaml.dump(json_response, fp)
-            response = {"token": json_response["access_token"]}
-
-        return response
+        except Exception as error:
+            raise UnexpectedError(f"Error when contacting '{url}'") from error
+
+        if response.status_code == 304 and entry is not None:
+            cache.touch(key, entry)
+            return entry["body"]
+        if not response.ok:
+            raise self.get_error_handler().get_exception(RequestsResponse(response))
+        body = response.json() if response.text else None
+        cache.put(
+            key,
+            body,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        return body
 
     def do_login(self):
-        headers = {"content-type": "application/x-www-form-urlencoded"}
-        response = requests.post(
+        response = self.get_session().post(
             f"https://{OAUTH_DOMAIN}/oauth/device/code",
-            headers=headers,
+            headers=TOKEN_HEADERS,
             data={
                 "client_id": ("%s" % CLIENT_ID),
                 "scope": "offline_access",
@@ -174,64 +170,99 @@ class AssemblyClient(APIClient):
         if "error" in json_response:
             print(f"Error during login - {json_response['error_description']}")
         else:
+            import yaml
+            from rich.console import Console
+
             print(f"\nYour device code - {json_response['device_code']}")
-            console.print(
+            Console().print(
                 f"\n\nAuthenticate through our login page: [link={json_response['verification_uri_complete']}]{json_response['verification_uri_complete']}[/link]\n",
                 style="bright_cyan",
             )
             with open("login.yaml", "w") as fp:
                 yaml.dump({"device_code": json_response["device_code"]}, fp)
                 remove_file("token.yaml")
+            self.token_provider.reset()
 
-    @staticmethod
-    def _map_parameters(parameters, actual_kwargs, key_map):
-        result = {}
-        for k, i in key_map.items():
-            #   handles a nested dictionary
-            if isinstance(i, dict):
-                result[k] = {}
-                for kk, ii in i.items():
-                    if kk in parameters and (
-                        parameters[kk] is not None or kk in actual_kwargs
-                    ):
-                        result[k][ii] = parameters[kk]
-            else:
-                #   handles a flat value
-                if k in parameters and (
-                    parameters[k] is not None or k in actual_kwargs
-                ):
-                    result[i] = parameters[k]
-        return result
-
-    @_arg_decorator
-    def create_batch(self, blueprint_id, account_id):
+    @request_params(BATCH_DEFINITION_ARG_MAP)
+    def create_batch(self, blueprint_id, account_id, input_key=None, *, params):
         url = self.ENDPOINT + "/batch"
-        params = self._map_parameters(
-            locals(), self.create_batch.actual_kwargs, BATCH_DEFINITION_ARG_MAP
-        )
         return self.post(url, data=params)
 
-    @_arg_decorator
     def get_batches(self):
         url = self.ENDPOINT + "/batch"
-        params = self._map_parameters(locals(), self.get_batches.actual_kwargs, {})
-        return self.get(url, params)
+        return self._cached_get(url)
+
+    def get_batch(self, batch_id, response_cache: ResponseCache = None):
+        url = self.ENDPOINT + f"/batch/{batch_id}"
+        return self._cached_get(url, response_cache=response_cache)
+
+    def batch_results_frame(self, batch_id):
+        """
+        Returns the results of a batch as a pandas DataFrame with Data.<name> and Result.<name>
+        columns, parsed by pyarrow. Requires the arrow extra.
+        """
+        from .export import (
+            _pyarrow,
+            conform_table,
+            iter_result_tables,
+            open_s3_lines,
+            unify_result_schemas,
+        )
 
-    @_arg_decorator
-    def create_task(self, blueprint_id, team_id):
+        pa = _pyarrow()
+        output_uri = self.get_batch(batch_id).get("OutputUri")
+        if not output_uri:
+            raise Exception(f"Batch {batch_id} has no output yet")
+        tables = list(iter_result_tables(open_s3_lines(output_uri)))
+        if not tables:
+            return pa.table({}).to_pandas()
+        schema = unify_result_schemas(table.schema for table in tables)
+        return pa.concat_tables(
+            [conform_table(table, schema) for table in tables]
+        ).to_pandas()
+
+    @request_params(TASK_DEFINITION_ARG_MAP)
+    def create_task(self, blueprint_id, team_id, *, params):
         url = self.ENDPOINT + "/task"
-        params = self._map_parameters(
-            locals(), self.create_task.actual_kwargs, TASK_DEFINITION_ARG_MAP
-        )
         return self.post(url, data=params)
 
-    @_arg_decorator
+    def iter_create_tasks(self, tasks, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Creates a task for each item in tasks, a dict of create_task arguments, using a pool of
+        concurrency worker threads. Yields a result for each item in input order, either
+        {"success": True, "response": ...} or {"success": False, "error": ...}.
+
+        At most a few items per worker are read ahead of the results being consumed, so tasks
+        can be any iterable, including a reader over a large file.
+        """
+
+        def create(item):
+            try:
+                return {"success": True, "response": self.create_task(**item)}
+            except Exception as exception:
+                return {"success": False, "error": str(exception)}
+
+        window = deque()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for item in tasks:
+                window.append(executor.submit(create, item))
+                if len(window) >= concurrency * 2:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+
+    def create_tasks(self, tasks, concurrency=DEFAULT_CONCURRENCY):
+        """
+        Creates a task for each item in tasks, see iter_create_tasks. Returns the list of results
+        in input order.
+        """
+        return list(self.iter_create_tasks(tasks, concurrency))
+
     def get_tasks(self):
         url = self.ENDPOINT + "/task"
-        params = self._map_parameters(locals(), self.get_tasks.actual_kwargs, {})
-        return self.get(url, params)
+        return self._cached_get(url)
 
-    @_arg_decorator
+    @request_params(BLUEPRINT_DEFINITION_ARG_MAP)
     def create_blueprint(
         self,
         name,
@@ -248,46 +279,122 @@ class AssemblyClient(APIClient):
         instructions_uri=None,
         result_template_uri=None,
         response_template_uri=None,
+        *,
+        params,
     ):
         url = self.ENDPOINT + "/blueprint"
-        params = self._map_parameters(
-            locals(), self.create_blueprint.actual_kwargs, BLUEPRINT_DEFINITION_ARG_MAP
-        )
         params["accountId"] = str(uuid.uuid4())
         return self.post(url, data=params)
 
-    @_arg_decorator
     def get_blueprint(self, id):
         url = self.ENDPOINT + f"/blueprint/{id}"
-        params = self._map_parameters(locals(), self.get_blueprint.actual_kwargs, {})
         headers = {"accept": "application/json"}
 
-        return self.get(url, params, headers)
+        return self._cached_get(url, headers=headers)
 
-    @_arg_decorator
-    def get_blueprints(self):
-        url = f"{self.ENDPOINT}/blueprint"
+    def _auth_headers(self):
         response = self.get_token()
 
         if "error" in response:
             raise Exception(f"Authentication Exception - {response['error']}")
 
-        headers = {
+        return {
             "accept": "application/json",
             "Authorization": f'Bearer {response["token"]}',
         }
-        params = self._map_parameters(locals(), self.get_blueprints.actual_kwargs, {})
+
+    def get_blueprints(self):
+        url = f"{self.ENDPOINT}/blueprint"
+        headers = self._auth_headers()
 
         try:
-            return self.get(endpoint=url, params=params, headers=headers)
+            return self._cached_get(url, headers=headers)
         except Exception as exception:
             print("Exception during get_blueprints..")
             print(exception)
 
-    @_arg_decorator
+    def _iter_pages(
+        self,
+        url,
+        items_key,
+        params=None,
+        headers=None,
+        prefetch=True,
+        response_cache: ResponseCache = None,
+    ):
+        """
+        Yields the items from each page of a list endpoint, following NextKey. With prefetch the
+        next page is requested on a background thread while the caller works through the
+        current one. Pages go through response_cache when given, otherwise the client's cache.
+
+        headers can be a function so that values such as the auth token are current for every
+        page.
+        """
+
+        def fetch(start_key):
+            page_params = dict(params) if params else {}
+            if start_key:
+                page_params["StartKey"] = start_key
+            page_headers = headers() if callable(headers) else headers
+            return self._cached_get(
+                url, page_params, headers=page_headers, response_cache=response_cache
+            )
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        try:
+            response = fetch(None)
+            while response is not None:
+                if isinstance(response, list):
+                    # Unpaged responses are a plain list of items
+                    start_key, items = None, response
+                else:
+                    start_key, items = response.get("NextKey"), response.get(
+                        items_key, []
+                    )
+                next_page = None
+                if start_key and executor:
+                    next_page = executor.submit(fetch, start_key)
+                for item in items:
+                    yield item
+                if next_page:
+                    response = next_page.result()
+                elif start_key:
+                    response = fetch(start_key)
+                else:
+                    response = None
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def iter_batches(self, prefetch=True, response_cache: ResponseCache = None):
+        return self._iter_pages(
+            self.ENDPOINT + "/batch",
+            "Batches",
+            prefetch=prefetch,
+            response_cache=response_cache,
+        )
+
+    def iter_tasks(self, prefetch=True, response_cache: ResponseCache = None):
+        return self._iter_pages(
+            self.ENDPOINT + "/task",
+            "Tasks",
+            prefetch=prefetch,
+            response_cache=response_cache,
+        )
+
+    def iter_blueprints(self, prefetch=True, response_cache: ResponseCache = None):
+        return self._iter_pages(
+            f"{self.ENDPOINT}/blueprint",
+            "Blueprints",
+            headers=self._auth_headers,
+            prefetch=prefetch,
+            response_cache=response_cache,
+        )
+
+    @request_params(BLUEPRINT_DEFINITION_ARG_MAP)
     def update_blueprint(
         self,
-        name,
+        name=None,
         state=None,
         title=None,
         description=None,
@@ -303,24 +410,15 @@ class AssemblyClient(APIClient):
         response_template_uri=None,
         account_id=None,
         blueprint_id=None,
+        *,
+        params,
     ):
         url = self.ENDPOINT + f"/blueprint/{blueprint_id}"
-        params = self._map_parameters(
-            locals(),
-            self.update_blueprint.actual_kwargs,
-            BLUEPRINT_DEFINITION_ARG_MAP,
-        )
-        print(params)
         return self.put(url, data=params)
 
-    @_arg_decorator
-    def create_blueprint_asset(self, blueprint_id, name, kb=0):
+    @request_params(BLUEPRINT_ASSET_DEFINITION_ARG_MAP)
+    def create_blueprint_asset(self, blueprint_id, name, kb=0, *, params):
         url = self.ENDPOINT + "/blueprint_asset"
-        params = self._map_parameters(
-            locals(),
-            self.create_blueprint_asset.actual_kwargs,
-            BLUEPRINT_ASSET_DEFINITION_ARG_MAP,
-        )
         return self.post(url, data=params)
 
 
@@ -343,14 +441,6 @@ from .utils import display_iframe, TASK_DEFINITION_ARG_MAP
 _client: "AssemblyClient" = None
 
 
-def _arg_decorator(function):
-    def inner(*args, **kwargs):
-        inner.actual_kwargs = kwargs
-        return function(*args, **kwargs)
-
-    return inner
-
-
 class Task(dict):
     def __getitem__(self, item):
         global _client
@@ -0,0 +1,312 @@
+import itertools
+
+try:
+    import numpy as np
+except ImportError:
+    raise Exception(
+        "task_assembly.consolidation requires numpy, install it with 'pip install task-assembly[analysis]'"
+    )
+
+ACCEPT = 0
+EXTEND = 1
+
+
+def normalize_value(value):
+    """
+    Default normalization, matching the example handler - lowercase and trim spaces
+    """
+    return str(value).lower().strip()
+
+
+def result_value(result):
+    """
+    Returns the answer from a Result, which handlers return as {"value": ...}
+    """
+    if isinstance(result, dict):
+        return result.get("value")
+    return result
+
+
+def _hashable(label):
+    try:
+        hash(label)
+        return label
+    except TypeError:
+        return str(label)
+
+
+def _encode(labels):
+    """
+    Returns (uniques, codes) with uniques in order of first appearance and codes indexing into
+    them. Hashing each label once is faster than sorting them with np.unique. Unhashable labels,
+    such as list or dict results, are encoded as their str(), which is what the handlers
+    compare.
+    """
+    labels = list(labels)
+    first_seen = {}
+    try:
+        raw = np.fromiter(
+            map(first_seen.setdefault, labels, itertools.count()),
+            dtype=np.int64,
+            count=len(labels),
+        )
+    except TypeError:
+        labels = [_hashable(label) for label in labels]
+        first_seen = {}
+        raw = np.fromiter(
+            map(first_seen.setdefault, labels, itertools.count()),
+            dtype=np.int64,
+            count=len(labels),
+        )
+    firsts = np.fromiter(first_seen.values(), dtype=np.int64, count=len(first_seen))
+    uniques = np.empty(len(first_seen), dtype=object)
+    uniques[:] = list(first_seen)
+    return uniques, np.searchsorted(firsts, raw)
+
+
+class ResponseSet:
+    """
+    Worker responses for offline consolidation, encoded once as parallel integer arrays so that
+    every policy runs with NumPy over all tasks at once. task_codes, worker_codes and value_codes index
+    into tasks, workers and values, and value_codes is -1 for ignored responses.
+    """
+
+    def __init__(
+        self, tasks, task_codes, values, value_codes, workers=None, worker_codes=None
+    ):
+        self.tasks = tasks
+        self.task_codes = task_codes
+        self.values = values
+        self.value_codes = value_codes
+        self.workers = workers
+        self.worker_codes = worker_codes
+
+    def __len__(self):
+        return len(self.task_codes)
+
+    @classmethod
+    def from_arrays(
+        cls, task_ids, values, worker_ids=None, normalize=normalize_value, ignore=None
+    ):
+        """
+        Encodes parallel sequences of task ids, response values and optionally worker ids.
+
+        normalize is applied once per distinct raw value rather than once per response. Values
+        for which ignore(normalized) is true, or that are None, are kept as responses but cast
+        no vote.
+        """
+        tasks, task_codes = _encode(task_ids)
+        raw_uniques, raw_codes = _encode(values)
+
+        normalized = [
+            None if value is None else normalize(value) if normalize else str(value)
+            for value in raw_uniques
+        ]
+        values_, value_map = _encode(normalized)
+        ignored = np.array(
+            [value is None or bool(ignore and ignore(value)) for value in values_],
+            dtype=bool,
+        )
+        value_map = np.where(ignored[value_map], -1, value_map)
+        value_codes = value_map[raw_codes]
+
+        workers = worker_codes = None
+        if worker_ids is not None:
+            workers, worker_codes = _encode(worker_ids)
+        return cls(tasks, task_codes, values_, value_codes, workers, worker_codes)
+
+    @classmethod
+    def from_assignments(cls, assignments, **kwargs):
+        """
+        Encodes assignment records with TaskId, WorkerId and Result fields
+        """
+        task_ids = []
+        worker_ids = []
+        values = []
+        for assignment in assignments:
+            task_ids.append(assignment.get("TaskId"))
+            worker_ids.append(assignment.get("WorkerId"))
+            values.append(result_value(assignment.get("Result")))
+        return cls.from_arrays(task_ids, values, worker_ids, **kwargs)
+
+
+class Consolidation:
+    """
+    Per-task outcome of a policy. decision is ACCEPT or EXTEND, value_codes indexes into values
+    (-1 when extended), support is the vote for the chosen value and total the vote cast.
+    """
+
+    def __init__(self, tasks, values, decision, value_codes, support, total):
+        self.tasks = tasks
+        self.values = values
+        self.decision = decision
+        self.value_codes = value_codes
+        self.support = support
+        self.total = total
+
+    def results(self):
+        """
+        Yields (task_id, result) with result in the handler format, {"value": ...} or
+        {"extend": True}
+        """
+        for task, decision, code in zip(self.tasks, self.decision, self.value_codes):
+            if decision == ACCEPT:
+                yield task, {"value": self.values[code]}
+            else:
+                yield task, {"extend": True}
+
+    def accepted_fraction(self):
+        return float(np.mean(self.decision == ACCEPT)) if len(self.decision) else 0.0
+
+
+def tally(responses: ResponseSet, weights=None):
+    """
+    Sums the votes for each task, returning per-task arrays (top_code, top, runner_up, total).
+    top_code is -1 for tasks without any vote.
+    """
+    n_tasks = len(responses.tasks)
+    n_values = max(len(responses.values), 1)
+    voted = responses.value_codes >= 0
+    task_codes = responses.task_codes[voted]
+    value_codes = responses.value_codes[voted]
+    vote_weights = None if weights is None else np.asarray(weights, dtype=float)[voted]
+
+    #   Sparse (task, value) pairs, so memory follows the number of responses rather than
+    #   tasks x distinct values
+    keys = task_codes.astype(np.int64) * n_values + value_codes
+    pairs, inverse = np.unique(keys, return_inverse=True)
+    scores = np.bincount(
+        inverse.reshape(-1), weights=vote_weights, minlength=len(pairs)
+    )
+    pair_tasks = pairs // n_values
+    pair_values = pairs % n_values
+
+    order = np.lexsort((-scores, pair_tasks))
+    pair_tasks = pair_tasks[order]
+    scores = scores[order]
+    pair_values = pair_values[order]
+
+    first = (
+        np.flatnonzero(np.r_[True, pair_tasks[1:] != pair_tasks[:-1]])
+        if len(pairs)
+        else np.array([], dtype=int)
+    )
+    has_second = np.zeros(len(first), dtype=bool)
+    if len(first):
+        second = first + 1
+        has_second = second < len(pair_tasks)
+        has_second[has_second] = (
+            pair_tasks[second[has_second]] == pair_tasks[first[has_second]]
+        )
+
+    top_code = np.full(n_tasks, -1, dtype=np.int64)
+    top = np.zeros(n_tasks)
+    runner_up = np.zeros(n_tasks)
+    top_code[pair_tasks[first]] = pair_values[first]
+    top[pair_tasks[first]] = scores[first]
+    runner_up[pair_tasks[first[has_second]]] = scores[first[has_second] + 1]
+    total = np.bincount(task_codes, weights=vote_weights, minlength=n_tasks).astype(
+        float
+    )
+    return top_code, top, runner_up, total
+
+
+def _decide(responses, top_code, top, total, accept):
+    decision = np.where(accept & (top_code >= 0), ACCEPT, EXTEND)
+    value_codes = np.where(decision == ACCEPT, top_code, -1)
+    return Consolidation(
+        responses.tasks, responses.values, decision, value_codes, top, total
+    )
+
+
+def majority_vote(responses: ResponseSet, min_votes=1):
+    """
+    Accepts the most common value when it has a strict majority over the runner up and at least
+    min_votes, otherwise extends
+    """
+    top_code, top, runner_up, total = tally(responses)
+    accept = (top > runner_up) & (top >= min_votes)
+    return _decide(responses, top_code, top, total, accept)
+
+
+def threshold_agreement(responses: ResponseSet, min_agreement=2, min_ratio=None):
+    """
+    Accepts a value once at least min_agreement workers gave it, and optionally when it is at
+    least min_ratio of the votes. As in the example handler, where two agreeing workers settle
+    a task, when several values qualify the one given first for the task is accepted, even if
+    another has more votes.
+    """
+    n_tasks = len(responses.tasks)
+    n_values = max(len(responses.values), 1)
+    voted = responses.value_codes >= 0
+    task_codes = responses.task_codes[voted]
+    keys = task_codes.astype(np.int64) * n_values + responses.value_codes[voted]
+    #   Responses are in the order they were given, so the first index of each (task, value)
+    #   pair orders the values of a task as the handler's dict does
+    pairs, first, counts = np.unique(keys, return_index=True, return_counts=True)
+    total = np.bincount(task_codes, minlength=n_tasks).astype(float)
+
+    pair_tasks = pairs // n_values
+    qualified = counts >= min_agreement
+    if min_ratio is not None:
+        qualified &= counts >= min_ratio * np.maximum(total[pair_tasks], 1)
+    pairs = pairs[qualified]
+    pair_tasks = pair_tasks[qualified]
+    order = np.lexsort((first[qualified], pair_tasks))
+    pairs = pairs[order]
+    pair_tasks = pair_tasks[order]
+    counts = counts[qualified][order]
+
+    chosen = (
+        np.r_[True, pair_tasks[1:] != pair_tasks[:-1]]
+        if len(pairs)
+        else np.zeros(0, bool)
+    )
+    top_code = np.full(n_tasks, -1, dtype=np.int64)
+    top = np.zeros(n_tasks)
+    top_code[pair_tasks[chosen]] = pairs[chosen] % n_values
+    top[pair_tasks[chosen]] = counts[chosen]
+    return _decide(responses, top_code, top, total, top_code >= 0)
+
+
+def weighted_vote(
+    responses: ResponseSet,
+    worker_weights,
+    min_weight=0.0,
+    min_share=0.5,
+    default_weight=1.0,
+):
+    """
+    Weights each vote by its worker, worker_weights being a dict of worker id to weight or an
+    array aligned with responses.workers. Accepts the top value when its weight is above
+    min_weight and more than min_share of the weight cast.
+    """
+    if responses.worker_codes is None:
+        raise Exception("Weighted vote needs responses encoded with worker ids")
+    if isinstance(worker_weights, dict):
+        worker_weights = np.array(
+            [
+                worker_weights.get(worker, default_weight)
+                for worker in responses.workers
+            ],
+            dtype=float,
+        )
+    weights = np.asarray(worker_weights, dtype=float)[responses.worker_codes]
+    top_code, top, runner_up, total = tally(responses, weights)
+    accept = (top > min_weight) & (top > min_share * total) & (top > runner_up)
+    return _decide(responses, top_code, top, total, accept)
+
+
+POLICIES = {
+    "majority": majority_vote,
+    "threshold": threshold_agreement,
+    "weighted": weighted_vote,
+}
+
+
+def consolidate(responses: ResponseSet, policy="threshold", **kwargs):
+    if policy not in POLICIES:
+        raise Exception(
+            f"Unknown consolidation policy '{policy}', use one of {list(POLICIES)}"
+        )
+    return POLICIES[policy](responses, **kwargs)
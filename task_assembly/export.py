@@ -0,0 +1,365 @@
+import csv
+import json
+import os
+import tempfile
+from pathlib import Path
+
+#   Rows held in memory while the CSV header is discovered, later rows are spilled to disk
+DEFAULT_BUFFER_ROWS = 10000
+DELIMITERS = {
+    "tsv": "\t",
+    "csv": ",",
+    "txt": "\t",
+}
+
+
+def open_s3_lines(uri):
+    """
+    Opens an S3 object and returns an iterator over its non-blank lines, as bytes, that streams
+    the body rather than reading the whole object into memory
+    """
+    import larry as lry
+
+    bucket, key = lry.s3.split_uri(uri)
+    response = lry.s3.client.get_object(Bucket=bucket, Key=key)
+    return (line for line in response["Body"].iter_lines() if line.strip())
+
+
+def flatten_result(result):
+    """
+    Returns the task input merged with its result, as a single row
+    """
+    row = dict(result.get("Data") or {})
+    row.update(result.get("Result") or {})
+    return row
+
+
+class _RowBuffer:
+    """
+    Holds rows until the header is known, keeping at most max_rows in memory and spilling the
+    rest to a temporary JSONL file
+    """
+
+    def __init__(self, max_rows=DEFAULT_BUFFER_ROWS):
+        self.max_rows = max_rows
+        self.fieldnames = {}
+        self._rows = []
+        self._spill = None
+
+    def append(self, row):
+        self.fieldnames.update(dict.fromkeys(row))
+        if len(self._rows) < self.max_rows:
+            self._rows.append(row)
+            return
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile("w+")
+        self._spill.write(json.dumps(row) + "\n")
+
+    def __iter__(self):
+        yield from self._rows
+        if self._spill is not None:
+            self._spill.seek(0)
+            for line in self._spill:
+                yield json.loads(line)
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+
+
+def _write_delimited(
+    rows, fp, delimiter, columns=None, buffer_rows=DEFAULT_BUFFER_ROWS
+):
+    if columns:
+        writer = csv.DictWriter(
+            fp, fieldnames=columns, delimiter=delimiter, extrasaction="ignore"
+        )
+        writer.writeheader()
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+        return count
+
+    buffer = _RowBuffer(buffer_rows)
+    try:
+        for row in rows:
+            buffer.append(row)
+        writer = csv.DictWriter(
+            fp, fieldnames=list(buffer.fieldnames), delimiter=delimiter
+        )
+        writer.writeheader()
+        count = 0
+        for row in buffer:
+            writer.writerow(row)
+            count += 1
+        return count
+    finally:
+        buffer.close()
+
+
+def export_results(lines, output_file, columns=None, buffer_rows=DEFAULT_BUFFER_ROWS):
+    """
+    Writes batch results, an iterable of JSONL lines, to output_file in a single pass. The
+    format comes from the extension, one of jsonl, json, csv, tsv, txt, parquet, arrow or
+    feather. Returns the number of results written.
+
+    CSV/TSV columns are the union of the Data and Result fields across all results unless
+    columns are given, in which case rows are written as they are read and other fields are
+    dropped.
+    """
+    ext = os.path.splitext(output_file)[1][1:].lower()
+    if ext in COLUMNAR_EXTENSIONS:
+        return export_columnar(lines, output_file)
+    delimiter = DELIMITERS.get(ext)
+    if ext not in ("jsonl", "json") and not delimiter:
+        raise Exception(
+            "Output file must have an extension of json, jsonl, csv, tsv, txt, parquet, arrow or feather"
+        )
+
+    count = 0
+    if ext == "jsonl":
+        with open(output_file, "wb") as fp:
+            for line in lines:
+                fp.write(line.rstrip(b"\r\n") + b"\n")
+                count += 1
+    elif ext == "json":
+        with open(output_file, "w") as fp:
+            fp.write("[")
+            for line in lines:
+                fp.write(",\n" if count else "\n")
+                fp.write(json.dumps(json.loads(line), indent=4))
+                count += 1
+            fp.write("\n]\n")
+    else:
+        rows = (flatten_result(json.loads(line)) for line in lines)
+        with open(output_file, "w", newline="") as fp:
+            count = _write_delimited(rows, fp, delimiter, columns, buffer_rows)
+    return count
+
+
+#   Size of the JSONL blocks parsed into each Arrow table / Parquet row group
+DEFAULT_BLOCK_BYTES = 16 * 1024 * 1024
+COLUMNAR_EXTENSIONS = ("parquet", "arrow", "feather")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.json
+    except ImportError:
+        raise Exception(
+            "Columnar export requires pyarrow, install it with 'pip install task-assembly[arrow]'"
+        )
+    return pyarrow
+
+
+def _flatten_table(table):
+    """
+    Flattens struct columns until none are left, so Data and Result fields become Data.<name>
+    and Result.<name> columns
+    """
+    pa = _pyarrow()
+    while any(pa.types.is_struct(field.type) for field in table.schema):
+        table = table.flatten()
+    return table
+
+
+def iter_result_tables(lines, block_bytes=DEFAULT_BLOCK_BYTES, schema=None):
+    """
+    Parses batch results, an iterable of JSONL lines, into a sequence of flattened Arrow tables
+    of about block_bytes of input each. Parsing is done by pyarrow rather than per row in Python.
+
+    Each block's schema is inferred separately, so tables can have different columns and types,
+    and unify_result_schemas combines them. A declared schema fixes the types of the fields it
+    lists, and fields it doesn't list are still inferred.
+    """
+    pa = _pyarrow()
+
+    parse_options = None
+    if schema is not None:
+        parse_options = pa.json.ParseOptions(
+            explicit_schema=schema, unexpected_field_behavior="infer"
+        )
+
+    def parse(block):
+        return _flatten_table(
+            pa.json.read_json(
+                pa.BufferReader(b"\n".join(block)), parse_options=parse_options
+            )
+        )
+
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line.rstrip(b"\r\n"))
+        size += len(line) + 1
+        if size >= block_bytes:
+            yield parse(block)
+            block = []
+            size = 0
+    if block:
+        yield parse(block)
+
+
+def unify_result_schemas(schemas):
+    """
+    Merges block schemas into one with every column, promoting types where blocks disagree,
+    e.g. null to string or int64 to double
+    """
+    pa = _pyarrow()
+    try:
+        return pa.unify_schemas(list(schemas), promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise Exception(
+            f"Results have conflicting column types, declare a schema for them - {e}"
+        )
+
+
+def conform_table(table, schema):
+    """
+    Casts a table to schema, adding the columns it lacks as nulls
+    """
+    pa = _pyarrow()
+    columns = [
+        (
+            table.column(field.name).cast(field.type)
+            if field.name in table.column_names
+            else pa.nulls(table.num_rows, field.type)
+        )
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def export_columnar(lines, output_file, block_bytes=DEFAULT_BLOCK_BYTES, schema=None):
+    """
+    Writes batch results to a Parquet file, one row group per block, or an Arrow IPC file
+    (.arrow/.feather), returning the number of results written.
+
+    The file's schema must be known before the first block is written, so each parsed block
+    is first spilled to a temporary Arrow file while the block schemas are unified, then
+    conformed to the unified schema and written. Only one block is held in memory at a time.
+    """
+    pa = _pyarrow()
+    ext = os.path.splitext(output_file)[1][1:].lower()
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        spilled = []
+        schemas = []
+        for table in iter_result_tables(lines, block_bytes, schema):
+            spill_file = os.path.join(spill_dir, f"{len(spilled)}.arrow")
+            with pa.ipc.new_file(spill_file, table.schema) as spill:
+                spill.write_table(table)
+            spilled.append(spill_file)
+            schemas.append(table.schema)
+        if not spilled:
+            return 0
+        unified = unify_result_schemas(schemas)
+
+        count = 0
+        if ext == "parquet":
+            import pyarrow.parquet
+
+            writer = pa.parquet.ParquetWriter(output_file, unified)
+        else:
+            writer = pa.ipc.new_file(output_file, unified)
+        try:
+            for spill_file in spilled:
+                with pa.memory_map(spill_file) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                writer.write_table(conform_table(table, unified))
+                count += table.num_rows
+        finally:
+            writer.close()
+    return count
+
+
+#   Bytes before the checkpoint offset that are re-read to confirm the object was only appended
+SYNC_TAIL_BYTES = 1024
+SYNC_CHUNK_BYTES = 1024 * 1024
+
+
+def sync_s3_lines(uri, local_file, checkpoint_file):
+    """
+    Brings local_file up to date with the JSONL object at uri by appending only the lines added
+    since the last sync, returning (lines_added, bytes_added).
+
+    The checkpoint records the synced byte offset, the object's ETag and a hash of the bytes
+    just before the offset. The tail is fetched with a single ranged GET starting
+    SYNC_TAIL_BYTES before the offset. If those bytes no longer match, the object was rewritten
+    and the file is downloaded again from the start. Only complete lines are kept, so a line
+    that is still being written is picked up by the next sync.
+    """
+    import hashlib
+    import larry as lry
+    from .caching import _read_json, _write_json
+
+    s3 = lry.s3.client
+    bucket, key = lry.s3.split_uri(uri)
+    checkpoint = _read_json(checkpoint_file, {})
+    if checkpoint.get("uri") != uri or not os.path.exists(local_file):
+        checkpoint = {}
+    offset = checkpoint.get("offset", 0)
+
+    head = s3.head_object(Bucket=bucket, Key=key)
+    if checkpoint and head["ETag"] == checkpoint.get("etag"):
+        return 0, 0
+    if head["ContentLength"] < offset:
+        offset = 0
+
+    start = max(offset - SYNC_TAIL_BYTES, 0)
+    if start == head["ContentLength"]:
+        return 0, 0
+    body = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-")["Body"]
+    tail = body.read(offset - start)
+    if offset and hashlib.sha256(tail).hexdigest() != checkpoint.get("tail_sha256"):
+        body.close()
+        offset = start = 0
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+        tail = b""
+
+    #   Drop anything appended after the last checkpoint by an interrupted sync
+    with open(local_file, "ab") as fp:
+        fp.truncate(offset)
+
+    end = offset
+    last_line = b""
+    added_lines = 0
+    with open(local_file, "r+b") as fp:
+        fp.seek(offset)
+        position = offset
+        pending = b""
+        for chunk in body.iter_chunks(SYNC_CHUNK_BYTES):
+            fp.write(chunk)
+            position += len(chunk)
+            newline = chunk.rfind(b"\n")
+            if newline < 0:
+                pending += chunk
+                continue
+            added_lines += chunk.count(b"\n")
+            last_line = (pending + chunk[:newline]).rsplit(b"\n", 1)[-1]
+            pending = chunk[newline + 1 :]
+            end = position - len(pending)
+        fp.truncate(end)
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    if end == offset:
+        return 0, 0
+    with open(local_file, "rb") as fp:
+        fp.seek(max(end - SYNC_TAIL_BYTES, 0))
+        tail = fp.read(end - max(end - SYNC_TAIL_BYTES, 0))
+    checkpoint = {
+        "uri": uri,
+        "offset": end,
+        "etag": head["ETag"] if end == head["ContentLength"] else None,
+        "tail_sha256": hashlib.sha256(tail).hexdigest(),
+        "last_task_id": checkpoint.get("last_task_id"),
+    }
+    try:
+        checkpoint["last_task_id"] = json.loads(last_line).get("TaskId")
+    except ValueError:
+        pass
+    _write_json(Path(checkpoint_file), checkpoint)
+    return added_lines, end - offset
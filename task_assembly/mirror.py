@@ -0,0 +1,287 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from .caching import ResponseCache, default_cache_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blueprints (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    state TEXT,
+    created TEXT,
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    blueprint_id TEXT,
+    name TEXT,
+    state TEXT,
+    created TEXT,
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    blueprint_id TEXT,
+    batch_id TEXT,
+    state TEXT,
+    created TEXT,
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS task_tags (
+    task_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS sync_log (
+    kind TEXT PRIMARY KEY,
+    synced REAL NOT NULL,
+    total INTEGER NOT NULL,
+    changed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blueprints_state ON blueprints (state);
+CREATE INDEX IF NOT EXISTS batches_state ON batches (state);
+CREATE INDEX IF NOT EXISTS batches_blueprint ON batches (blueprint_id);
+CREATE INDEX IF NOT EXISTS batches_created ON batches (created);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state);
+CREATE INDEX IF NOT EXISTS tasks_blueprint ON tasks (blueprint_id);
+CREATE INDEX IF NOT EXISTS tasks_batch ON tasks (batch_id);
+CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created);
+CREATE INDEX IF NOT EXISTS task_tags_tag ON task_tags (tag, value);
+CREATE INDEX IF NOT EXISTS task_tags_task ON task_tags (task_id);
+"""
+
+#   Columns extracted from each item, with the keys the API may use for them
+COLUMNS = {
+    "blueprints": {
+        "id": ("Id", "BlueprintId", "blueprint_id", "id"),
+        "name": ("Name", "name"),
+        "state": ("State", "state"),
+        "created": ("Created", "created_at", "created"),
+    },
+    "batches": {
+        "id": ("Id", "BatchId", "batch_id", "id"),
+        "blueprint_id": ("BlueprintId", "blueprintId", "blueprint_id"),
+        "name": ("Name", "name"),
+        "state": ("State", "state"),
+        "created": ("Created", "created_at", "created"),
+    },
+    "tasks": {
+        "id": ("Id", "TaskId", "task_id", "id"),
+        "blueprint_id": ("BlueprintId", "blueprintId", "blueprint_id"),
+        "batch_id": ("BatchId", "batchId", "batch_id"),
+        "state": ("State", "state"),
+        "created": ("Created", "created_at", "created"),
+    },
+}
+SYNC_ORDER = ("blueprints", "batches", "tasks")
+PAGE_ROWS = 500
+
+
+def default_mirror_path():
+    return default_cache_dir().joinpath("mirror.db")
+
+
+def _value(item, keys):
+    for key in keys:
+        if key in item:
+            return item[key]
+    return None
+
+
+def _tags(item):
+    """
+    Returns (tag, value) pairs for the tags of a task, which may be a dict, a list of
+    {Name/Key, Value} objects or a list of names
+    """
+    tags = _value(item, ("Tags", "tags"))
+    if isinstance(tags, dict):
+        return [(str(k), None if v is None else str(v)) for k, v in tags.items()]
+    pairs = []
+    for tag in tags or []:
+        if isinstance(tag, dict):
+            name = _value(tag, ("Name", "Key", "name", "key"))
+            value = _value(tag, ("Value", "value"))
+            pairs.append((str(name), None if value is None else str(value)))
+        else:
+            pairs.append((str(tag), None))
+    return pairs
+
+
+class Mirror:
+    """
+    Local SQLite copy of the account's blueprints, batches and tasks.
+
+    sync() pages through each list with conditional requests, so pages that haven't changed
+    since the last sync come back as a 304, and only rewrites rows whose content hash changed.
+    Rows that are no longer returned by the API are removed. Queries then run against indexed
+    columns locally.
+    """
+
+    def __init__(self, path=None, cache: ResponseCache = None):
+        self.path = str(path or default_mirror_path())
+        default_cache_dir().mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+        #   Pages are always revalidated
+        self.cache = cache or ResponseCache(
+            default_cache_dir().joinpath("mirror-pages"), ttl=0
+        )
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _items(self, client, kind):
+        if kind == "blueprints":
+            return client.iter_blueprints(response_cache=self.cache)
+        if kind == "batches":
+            return client.iter_batches(response_cache=self.cache)
+        return client.iter_tasks(response_cache=self.cache)
+
+    def sync(self, client, kinds=SYNC_ORDER):
+        """
+        Brings the mirror up to date, returning {kind: (total, changed, removed)}
+        """
+        results = {}
+        for kind in kinds:
+            results[kind] = self._sync_kind(client, kind)
+        return results
+
+    def _sync_kind(self, client, kind):
+        columns = list(COLUMNS[kind])
+        names = ", ".join(columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+        upsert = (
+            f"INSERT INTO {kind} ({names}, hash, data) "
+            f"VALUES ({', '.join('?' * (len(columns) + 2))}) "
+            f"ON CONFLICT(id) DO UPDATE SET {updates}, hash = excluded.hash, "
+            f"data = excluded.data WHERE {kind}.hash != excluded.hash"
+        )
+
+        db = self.db
+        db.execute("DROP TABLE IF EXISTS temp.seen")
+        db.execute("CREATE TEMP TABLE seen (id TEXT PRIMARY KEY)")
+        total = 0
+        changed = 0
+        with db:
+            rows = []
+            for item in self._items(client, kind):
+                data = json.dumps(item, sort_keys=True)
+                values = [_value(item, COLUMNS[kind][c]) for c in columns]
+                if values[0] is None:
+                    continue
+                digest = hashlib.sha256(data.encode()).hexdigest()
+                rows.append((*values, digest, data, item))
+                if len(rows) >= PAGE_ROWS:
+                    changed += self._write(kind, upsert, rows)
+                    total += len(rows)
+                    rows = []
+            changed += self._write(kind, upsert, rows)
+            total += len(rows)
+
+            removed = db.execute(
+                f"DELETE FROM {kind} WHERE id NOT IN (SELECT id FROM temp.seen)"
+            ).rowcount
+            if kind == "tasks":
+                db.execute(
+                    "DELETE FROM task_tags WHERE task_id NOT IN (SELECT id FROM tasks)"
+                )
+            db.execute(
+                "INSERT OR REPLACE INTO sync_log VALUES (?, ?, ?, ?)",
+                (kind, time.time(), total, changed),
+            )
+        db.execute("DROP TABLE temp.seen")
+        return total, changed, removed
+
+    def _write(self, kind, upsert, rows):
+        """
+        Upserts the rows whose content hash differs from the stored one, returning how many
+        """
+        if not rows:
+            return 0
+        db = self.db
+        ids = [row[0] for row in rows]
+        db.executemany(
+            "INSERT OR IGNORE INTO temp.seen VALUES (?)", [(i,) for i in ids]
+        )
+        stored = dict(
+            db.execute(
+                f"SELECT id, hash FROM {kind} WHERE id IN ({', '.join('?' * len(ids))})",
+                ids,
+            ).fetchall()
+        )
+        changed = [row for row in rows if stored.get(row[0]) != row[-3]]
+        if not changed:
+            return 0
+        db.executemany(upsert, [row[:-1] for row in changed])
+        if kind == "tasks":
+            self._write_tags(changed)
+        return len(changed)
+
+    def _write_tags(self, rows):
+        db = self.db
+        db.executemany(
+            "DELETE FROM task_tags WHERE task_id = ?", [(row[0],) for row in rows]
+        )
+        db.executemany(
+            "INSERT INTO task_tags VALUES (?, ?, ?)",
+            [(row[0], tag, value) for row in rows for tag, value in _tags(row[-1])],
+        )
+
+    def query(
+        self,
+        kind,
+        state=None,
+        blueprint_id=None,
+        batch_id=None,
+        tag=None,
+        tag_value=None,
+        since=None,
+        limit=None,
+    ):
+        """
+        Returns the mirrored items of kind matching every filter given, newest first
+        """
+        clauses = []
+        params = []
+        if state:
+            clauses.append("state = ?")
+            params.append(state)
+        if blueprint_id and kind != "blueprints":
+            clauses.append("blueprint_id = ?")
+            params.append(blueprint_id)
+        if batch_id and kind == "tasks":
+            clauses.append("batch_id = ?")
+            params.append(batch_id)
+        if tag and kind == "tasks":
+            if tag_value is None:
+                clauses.append("id IN (SELECT task_id FROM task_tags WHERE tag = ?)")
+                params.append(tag)
+            else:
+                clauses.append(
+                    "id IN (SELECT task_id FROM task_tags WHERE tag = ? AND value = ?)"
+                )
+                params.extend([tag, tag_value])
+        if since:
+            clauses.append("created >= ?")
+            params.append(since)
+
+        sql = f"SELECT data FROM {kind}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [json.loads(row["data"]) for row in self.db.execute(sql, params)]
@@ -0,0 +1,206 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .caching import default_cache_dir
+from .utils import DEFAULT_CONCURRENCY
+
+DEFAULT_MAX_ATTEMPTS = 6
+#   First retry delay in seconds, doubled with each further attempt
+DEFAULT_RETRY_DELAY = 0.5
+#   Error codes MTurk returns when requests are rate limited
+THROTTLING_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "ServiceUnavailable",
+}
+#   Completed assignments between progress lines
+REPORT_EVERY = 500
+
+
+def default_progress_path(definition_id):
+    return default_cache_dir().joinpath("qualifications", f"{definition_id}.jsonl")
+
+
+class QualificationProgress:
+    """
+    Append-only record of a qualification assignment run. The first line holds the
+    qualification type id and each later line a worker that was assigned it, so a rerun can
+    reuse the qualification and skip those workers. Each line is flushed as it is written and
+    a partially written last line is ignored and ended before new lines are appended.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.qualification_id = None
+        self.assigned = set()
+        self._fp = None
+        if self.path.exists():
+            with open(self.path) as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.qualification_id = record.get(
+                        "QualificationTypeId", self.qualification_id
+                    )
+                    if record.get("WorkerId"):
+                        self.assigned.add(record["WorkerId"])
+
+    def start(self, qualification_id):
+        if self.qualification_id and self.qualification_id != qualification_id:
+            raise Exception(
+                f"{self.path} records assignments to qualification {self.qualification_id}"
+            )
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        #   Appending straight onto a partially written last line would corrupt the next record
+        partial = False
+        if self.path.exists() and self.path.stat().st_size:
+            with open(self.path, "rb") as fp:
+                fp.seek(-1, 2)
+                partial = fp.read(1) != b"\n"
+        self._fp = open(self.path, "a")
+        if partial:
+            self._fp.write("\n")
+        if self.qualification_id is None:
+            self.qualification_id = qualification_id
+            self._append({"QualificationTypeId": qualification_id})
+
+    def _append(self, record):
+        self._fp.write(json.dumps(record) + "\n")
+        self._fp.flush()
+
+    def record(self, worker_id):
+        self.assigned.add(worker_id)
+        self._append({"WorkerId": worker_id})
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+
+class AssignmentReport:
+    def __init__(self, qualification_id, assigned, skipped, failures, elapsed):
+        self.qualification_id = qualification_id
+        self.assigned = assigned
+        self.skipped = skipped
+        self.failures = failures
+        self.elapsed = elapsed
+
+    @property
+    def rate(self):
+        return self.assigned / self.elapsed if self.elapsed else 0.0
+
+
+def _assign(
+    mturk_client,
+    qualification_id,
+    worker_id,
+    value,
+    max_attempts,
+    retry_delay,
+):
+    """
+    Assigns the qualification to a worker, retrying with exponential backoff and jitter while
+    MTurk throttles the request
+    """
+    from botocore.exceptions import ClientError
+
+    attempt = 1
+    while True:
+        try:
+            mturk_client.associate_qualification_with_worker(
+                QualificationTypeId=qualification_id,
+                WorkerId=worker_id,
+                IntegerValue=value,
+                SendNotification=False,
+            )
+            return
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code not in THROTTLING_CODES or attempt >= max_attempts:
+                raise e
+            time.sleep(retry_delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.0))
+            attempt += 1
+
+
+def assign_qualification(
+    qualification_id,
+    worker_ids,
+    value=1,
+    progress: QualificationProgress = None,
+    mturk_client=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    max_attempts=DEFAULT_MAX_ATTEMPTS,
+    retry_delay=DEFAULT_RETRY_DELAY,
+    out=None,
+):
+    """
+    Assigns a qualification to each worker on a pool of concurrency threads, skipping workers
+    already recorded in progress and recording each new assignment there. mturk_client is a
+    boto3 MTurk client, larry's by default. Returns an AssignmentReport, with the workers that
+    could not be assigned and their error in failures.
+    """
+    if mturk_client is None:
+        import larry as lry
+
+        mturk_client = lry.mturk.client
+    if progress is not None:
+        progress.start(qualification_id)
+    worker_ids = list(dict.fromkeys(worker_ids))
+    done = progress.assigned if progress is not None else set()
+    pending = [w for w in worker_ids if w not in done]
+    skipped = len(worker_ids) - len(pending)
+
+    start = time.time()
+    assigned = 0
+    failures = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(
+                    _assign,
+                    mturk_client,
+                    qualification_id,
+                    worker_id,
+                    value,
+                    max_attempts,
+                    retry_delay,
+                ): worker_id
+                for worker_id in pending
+            }
+            try:
+                for future in as_completed(futures):
+                    worker_id = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failures[worker_id] = str(e)
+                        continue
+                    assigned += 1
+                    if progress is not None:
+                        progress.record(worker_id)
+                    if out and assigned % REPORT_EVERY == 0:
+                        elapsed = time.time() - start
+                        print(
+                            f"Assigned {assigned} of {len(pending)} workers, "
+                            f"{assigned / elapsed:.1f}/s",
+                            file=out,
+                        )
+            except BaseException:
+                #   Don't start the remaining assignments when interrupted, a rerun picks them up
+                for future in futures:
+                    future.cancel()
+                raise
+    finally:
+        if progress is not None:
+            progress.close()
+    return AssignmentReport(
+        qualification_id, assigned, skipped, failures, time.time() - start
+    )
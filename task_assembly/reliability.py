@@ -0,0 +1,360 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+#   consolidation raises a clear error when numpy isn't installed
+from .consolidation import ResponseSet
+
+import numpy as np
+
+DEFAULT_MAX_ITERATIONS = 50
+DEFAULT_TOLERANCE = 1e-6
+#   Pseudo-count added to every confusion matrix cell and class prior, so workers with few
+#   responses don't end up with zero probabilities
+DEFAULT_SMOOTHING = 0.01
+
+#   Task chunks held by each worker process, set once by _init_process
+_CHUNKS = None
+
+
+def _chunks(responses: ResponseSet, count):
+    """
+    Splits the voted responses into count chunks of whole tasks, each a tuple of
+    (first_task, task_count, local_task_codes, worker_codes, value_codes)
+    """
+    voted = responses.value_codes >= 0
+    order = np.argsort(responses.task_codes[voted], kind="stable")
+    task_codes = responses.task_codes[voted][order]
+    worker_codes = responses.worker_codes[voted][order]
+    value_codes = responses.value_codes[voted][order]
+
+    n_tasks = len(responses.tasks)
+    bounds = np.linspace(0, n_tasks, max(count, 1) + 1).astype(np.int64)
+    starts = np.searchsorted(task_codes, bounds)
+    chunks = []
+    for i in range(len(bounds) - 1):
+        rows = slice(starts[i], starts[i + 1])
+        chunks.append(
+            (
+                int(bounds[i]),
+                int(bounds[i + 1] - bounds[i]),
+                task_codes[rows] - bounds[i],
+                worker_codes[rows],
+                value_codes[rows],
+            )
+        )
+    return chunks
+
+
+def _statistics(chunk, posteriors, n_workers, n_values):
+    """
+    Expected counts of (worker, true value, given value) and of true values for a chunk
+    """
+    _, n_tasks, task_codes, worker_codes, value_codes = chunk
+    k = np.arange(n_values)
+    cells = (
+        (worker_codes[:, None] * n_values + k[None, :]) * n_values
+        + value_codes[:, None]
+    ).reshape(-1)
+    confusion = np.bincount(
+        cells,
+        weights=posteriors[task_codes].reshape(-1),
+        minlength=n_workers * n_values * n_values,
+    )
+    has_votes = np.bincount(task_codes, minlength=n_tasks) > 0
+    return confusion, posteriors[has_votes].sum(axis=0)
+
+
+def _expect(chunk, log_confusion, log_priors):
+    """
+    E-step for a chunk, returning the posterior over true values of each of its tasks and the
+    log-likelihood of its responses
+    """
+    _, n_tasks, task_codes, worker_codes, value_codes = chunk
+    n_values = len(log_priors)
+    #   log P(given value | true value k) for each response and each k
+    contributions = log_confusion[worker_codes, :, value_codes]
+    k = np.arange(n_values)
+    log_joint = np.bincount(
+        (task_codes[:, None] * n_values + k[None, :]).reshape(-1),
+        weights=contributions.reshape(-1),
+        minlength=n_tasks * n_values,
+    ).reshape(n_tasks, n_values)
+    log_joint += log_priors
+    top = log_joint.max(axis=1, keepdims=True)
+    joint = np.exp(log_joint - top)
+    norm = joint.sum(axis=1, keepdims=True)
+    has_votes = np.bincount(task_codes, minlength=n_tasks) > 0
+    log_likelihood = float((np.log(norm[:, 0]) + top[:, 0])[has_votes].sum())
+    return joint / norm, log_likelihood
+
+
+def _step(chunk, log_confusion, log_priors, n_workers):
+    posteriors, log_likelihood = _expect(chunk, log_confusion, log_priors)
+    confusion, priors = _statistics(chunk, posteriors, n_workers, len(log_priors))
+    return confusion, priors, log_likelihood
+
+
+def _init_process(chunks):
+    global _CHUNKS
+    _CHUNKS = chunks
+
+
+def _step_process(index, log_confusion, log_priors, n_workers):
+    return _step(_CHUNKS[index], log_confusion, log_priors, n_workers)
+
+
+def _expect_process(index, log_confusion, log_priors):
+    return _expect(_CHUNKS[index], log_confusion, log_priors)
+
+
+def _majority_posteriors(chunk, n_values):
+    """
+    Initial posteriors, the share of each task's votes given to each value
+    """
+    _, n_tasks, task_codes, _, value_codes = chunk
+    counts = np.bincount(
+        task_codes * n_values + value_codes, minlength=n_tasks * n_values
+    ).reshape(n_tasks, n_values)
+    totals = counts.sum(axis=1, keepdims=True)
+    return np.where(totals > 0, counts / np.maximum(totals, 1), 1.0 / n_values)
+
+
+def _maximize(confusion, priors, n_workers, n_values, smoothing):
+    confusion = confusion.reshape(n_workers, n_values, n_values) + smoothing
+    confusion /= confusion.sum(axis=2, keepdims=True)
+    priors = priors + smoothing
+    priors /= priors.sum()
+    return np.log(confusion), np.log(priors)
+
+
+class Reliability:
+    """
+    Dawid-Skene estimates for a set of responses. confusion[w, k, j] is the probability that
+    worker w gives values[j] when the true value is values[k], priors[k] the share of tasks
+    whose true value is values[k] and posteriors[t, k] the probability that it is the true value
+    of tasks[t]. values only holds the values that were voted for, and tasks without a vote
+    (has_votes false) are left out of results() and task_labels().
+    """
+
+    def __init__(
+        self,
+        tasks,
+        workers,
+        values,
+        posteriors,
+        confusion,
+        priors,
+        response_counts,
+        log_likelihood,
+        iterations,
+        has_votes,
+    ):
+        self.tasks = tasks
+        self.workers = workers
+        self.values = values
+        self.posteriors = posteriors
+        self.has_votes = has_votes
+        self.confusion = confusion
+        self.priors = priors
+        self.response_counts = response_counts
+        self.log_likelihood = log_likelihood
+        self.iterations = iterations
+
+    def accuracy(self):
+        """
+        Probability that each worker gives the true value, weighting the confusion matrix
+        diagonal by the class priors
+        """
+        return np.einsum("wkk,k->w", self.confusion, self.priors)
+
+    def worker_weights(self):
+        """
+        Worker accuracies as a dict, usable as the worker_weights of consolidation.weighted_vote
+        """
+        return dict(zip(self.workers, self.accuracy().tolist()))
+
+    def results(self):
+        """
+        Yields (task_id, result) with the most probable value, as {"value": ...}, for each task
+        with a vote
+        """
+        codes = self.posteriors.argmax(axis=1)
+        for task, code, voted in zip(self.tasks, codes, self.has_votes):
+            if voted:
+                yield task, {"value": self.values[code]}
+
+    def task_labels(self):
+        codes = self.posteriors.argmax(axis=1)
+        confidence = self.posteriors.max(axis=1)
+        return [
+            {
+                "TaskId": task,
+                "Value": self.values[code],
+                "Confidence": round(float(p), 4),
+            }
+            for task, code, p, voted in zip(
+                self.tasks, codes, confidence, self.has_votes
+            )
+            if voted
+        ]
+
+    def worker_scores(self):
+        """
+        Estimated accuracy per worker, with Score on the 0-100 scale of list_workers
+        """
+        return [
+            {
+                "WorkerId": worker,
+                "ResponseCount": int(count),
+                "Score": round(float(accuracy) * 100, 1),
+            }
+            for worker, count, accuracy in zip(
+                self.workers, self.response_counts, self.accuracy()
+            )
+            if worker is not None
+        ]
+
+    def confusion_matrix(self, worker_id):
+        """
+        Returns {true value: {given value: probability}} for a worker
+        """
+        index = list(self.workers).index(worker_id)
+        return {
+            true: dict(zip(self.values, row.tolist()))
+            for true, row in zip(self.values, self.confusion[index])
+        }
+
+
+def dawid_skene(
+    responses: ResponseSet,
+    max_iterations=DEFAULT_MAX_ITERATIONS,
+    tolerance=DEFAULT_TOLERANCE,
+    smoothing=DEFAULT_SMOOTHING,
+    processes=None,
+):
+    """
+    Estimates a confusion matrix for each worker and the posterior over true values for each
+    task with the Dawid-Skene EM algorithm, starting from the vote shares and stopping once the
+    log-likelihood improves by less than tolerance, relatively.
+
+    Each step runs over all responses at once with NumPy. With processes above 1 the tasks are
+    split into that many chunks, sent to a process pool once, and each iteration only exchanges
+    the confusion matrices and priors with it.
+    """
+    if responses.worker_codes is None:
+        raise Exception(
+            "Reliability estimation needs responses encoded with worker ids"
+        )
+    #   Ignored values, e.g. None, can't be true values, so only voted ones are kept
+    voted = responses.value_codes >= 0
+    voted_codes = np.unique(responses.value_codes[voted])
+    n_workers = len(responses.workers)
+    n_values = len(voted_codes)
+    if not n_values:
+        raise Exception("There are no responses to estimate reliability from")
+    compact = np.full(len(responses.values), -1, dtype=np.int64)
+    compact[voted_codes] = np.arange(n_values)
+    values = [responses.values[code] for code in voted_codes]
+    responses = ResponseSet(
+        responses.tasks,
+        responses.task_codes,
+        values,
+        np.where(voted, compact[responses.value_codes], -1),
+        responses.workers,
+        responses.worker_codes,
+    )
+
+    chunks = _chunks(responses, processes or 1)
+    confusion = np.zeros(n_workers * n_values * n_values)
+    priors = np.zeros(n_values)
+    for chunk in chunks:
+        chunk_confusion, chunk_priors = _statistics(
+            chunk, _majority_posteriors(chunk, n_values), n_workers, n_values
+        )
+        confusion += chunk_confusion
+        priors += chunk_priors
+    log_confusion, log_priors = _maximize(
+        confusion, priors, n_workers, n_values, smoothing
+    )
+
+    executor = None
+    if processes and processes > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=processes, initializer=_init_process, initargs=(chunks,)
+        )
+    try:
+        indexes = range(len(chunks))
+        log_likelihood = None
+        iterations = 0
+        while iterations < max_iterations:
+            if executor:
+                steps = executor.map(
+                    _step_process,
+                    indexes,
+                    repeat(log_confusion),
+                    repeat(log_priors),
+                    repeat(n_workers),
+                )
+            else:
+                steps = (
+                    _step(chunk, log_confusion, log_priors, n_workers)
+                    for chunk in chunks
+                )
+            confusion = np.zeros(n_workers * n_values * n_values)
+            priors = np.zeros(n_values)
+            total = 0.0
+            for chunk_confusion, chunk_priors, chunk_log_likelihood in steps:
+                confusion += chunk_confusion
+                priors += chunk_priors
+                total += chunk_log_likelihood
+            log_confusion, log_priors = _maximize(
+                confusion, priors, n_workers, n_values, smoothing
+            )
+            iterations += 1
+            converged = log_likelihood is not None and abs(
+                total - log_likelihood
+            ) <= tolerance * abs(log_likelihood)
+            log_likelihood = total
+            if converged:
+                break
+
+        if executor:
+            expectations = executor.map(
+                _expect_process,
+                indexes,
+                repeat(log_confusion),
+                repeat(log_priors),
+            )
+        else:
+            expectations = (
+                _expect(chunk, log_confusion, log_priors) for chunk in chunks
+            )
+        posteriors = np.concatenate([posterior for posterior, _ in expectations])
+    finally:
+        if executor:
+            executor.shutdown()
+
+    return Reliability(
+        responses.tasks,
+        responses.workers,
+        responses.values,
+        posteriors,
+        np.exp(log_confusion),
+        np.exp(log_priors),
+        np.bincount(responses.worker_codes[voted], minlength=n_workers),
+        log_likelihood,
+        iterations,
+        np.bincount(responses.task_codes[voted], minlength=len(responses.tasks)) > 0,
+    )
+
+
+def estimate_reliability(
+    assignments, processes=None, max_iterations=DEFAULT_MAX_ITERATIONS, **kwargs
+):
+    """
+    Encodes assignment records with TaskId, WorkerId and Result fields, as returned by
+    iter_assignments, and runs dawid_skene over them. kwargs are passed to
+    ResponseSet.from_assignments, e.g. normalize and ignore.
+    """
+    responses = ResponseSet.from_assignments(assignments, **kwargs)
+    return dawid_skene(responses, max_iterations=max_iterations, processes=processes)
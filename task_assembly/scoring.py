@@ -0,0 +1,154 @@
+import json
+
+#   consolidation raises a clear error when numpy isn't installed
+from .consolidation import _encode, result_value
+
+import numpy as np
+
+EXACT_SCORE = 100
+PARTIAL_SCORE = 80
+
+
+def gold_key(data):
+    """
+    Key used to match a result to its gold answer, the task's input Data
+    """
+    if isinstance(data, dict):
+        key = tuple(sorted(data.items()))
+        try:
+            hash(key)
+            return key
+        except TypeError:
+            pass
+    return json.dumps(data, sort_keys=True)
+
+
+def _forms(values):
+    """
+    Returns the normalized forms compared by score_response for each value - lowercase, without
+    'and ' and with hyphens as spaces
+    """
+    lower = [str(value).lower() for value in values]
+    return (
+        lower,
+        [value.replace("and ", "") for value in lower],
+        [value.replace("-", " ") for value in lower],
+    )
+
+
+class GoldSet:
+    """
+    Gold answers normalized once and indexed by their task Data, to score whole result sets with
+    the same rules as the example score_response handler: 100 for an exact match ignoring case,
+    80 when the answers match without 'and ' or with hyphens as spaces, and 0 otherwise.
+    """
+
+    def __init__(self, gold):
+        keys = []
+        expected = []
+        for item in gold:
+            keys.append(gold_key(item.get("Data")))
+            expected.append(result_value(item.get("Result")))
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.forms = _forms(expected)
+
+    @classmethod
+    def from_file(cls, file_name):
+        with open(file_name) as fp:
+            return cls(json.load(fp))
+
+    def score(self, records):
+        """
+        Scores records with Data and Result fields, and optionally TaskId and WorkerId, such as
+        batch output or assignment dumps. Records without a gold answer or a result are left
+        unscored.
+        """
+        task_ids = []
+        worker_ids = []
+        gold_rows = []
+        values = []
+        for record in records:
+            key = gold_key(record.get("Data"))
+            task_ids.append(
+                record.get("TaskId") or json.dumps(record.get("Data"), sort_keys=True)
+            )
+            worker_ids.append(record.get("WorkerId"))
+            gold_rows.append(self.index.get(key, -1))
+            #   Falsy values are unscored by score_response
+            values.append(result_value(record.get("Result")) or None)
+        gold_rows = np.asarray(gold_rows, dtype=np.int64)
+
+        #   Each distinct response is normalized once
+        uniques, codes = _encode(values)
+        blank = np.array([not value for value in uniques], dtype=bool)[codes]
+        scored = (gold_rows >= 0) & ~blank
+
+        scores = np.zeros(len(codes))
+        if len(codes) and self.index:
+            rows = np.where(scored, gold_rows, 0)
+            match = []
+            for response_form, gold_form in zip(_forms(uniques), self.forms):
+                #   Gold and response forms share one vocabulary so they compare as integers
+                _, form_codes = _encode(list(gold_form) + list(response_form))
+                gold_codes = form_codes[: len(gold_form)]
+                response_codes = form_codes[len(gold_form) :]
+                match.append(response_codes[codes] == gold_codes[rows])
+            scores = np.where(
+                match[0],
+                EXACT_SCORE,
+                np.where(match[1] | match[2], PARTIAL_SCORE, 0),
+            ).astype(float)
+        scores[~scored] = np.nan
+        return ScoreReport(task_ids, worker_ids, scores)
+
+
+class ScoreReport:
+    """
+    Per-response gold scores, NaN where a response wasn't scored, with per-task and per-worker
+    aggregates
+    """
+
+    def __init__(self, task_ids, worker_ids, scores):
+        self.task_ids = task_ids
+        self.worker_ids = worker_ids
+        self.scores = scores
+
+    @property
+    def scored(self):
+        return ~np.isnan(self.scores)
+
+    def _aggregate(self, ids):
+        uniques, codes = _encode(ids)
+        scored = self.scored
+        counts = np.bincount(codes[scored], minlength=len(uniques))
+        points = np.bincount(
+            codes[scored], weights=self.scores[scored], minlength=len(uniques)
+        )
+        return uniques, counts, points
+
+    def task_scores(self):
+        tasks, counts, points = self._aggregate(self.task_ids)
+        return [
+            {
+                "TaskId": task,
+                "ScoredCount": int(count),
+                "Score": round(float(point / count), 1) if count else None,
+            }
+            for task, count, point in zip(tasks, counts, points)
+        ]
+
+    def worker_scores(self):
+        """
+        Scores per worker, with the fields of list_workers
+        """
+        workers, counts, points = self._aggregate(self.worker_ids)
+        return [
+            {
+                "WorkerId": worker,
+                "ScoredCount": int(count),
+                "Points": float(point),
+                "Score": round(float(point / count), 1) if count else None,
+            }
+            for worker, count, point in zip(workers, counts, points)
+            if worker is not None
+        ]
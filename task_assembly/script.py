@@ -0,0 +1,146 @@
+import io
+import json
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .utils import DEFAULT_CONCURRENCY
+
+#   CLI methods that can't be run from a script
+EXCLUDED_OPS = {"run", "login_flow"}
+
+
+class ThreadLocalStdout(io.TextIOBase):
+    """
+    Stand-in for sys.stdout that sends each thread's output to the buffer it has started with
+    capture(). Output of the thread that created it goes to the wrapped stream, and output of
+    any other thread, e.g. a background token refresh, to other_threads if given.
+    """
+
+    def __init__(self, stream, other_threads=None):
+        self.stream = stream
+        self.other_threads = other_threads or stream
+        self._owner = threading.get_ident()
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+
+    def release(self):
+        buffer = self._local.buffer
+        self._local.buffer = None
+        return buffer.getvalue()
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        if threading.get_ident() != self._owner:
+            return self.other_threads.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+        self.other_threads.flush()
+
+
+class InvalidOp:
+    """
+    Stands in for an op whose line couldn't be parsed, so it's reported like a failed op
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def read_ops(file_name):
+    with open(file_name) as fp:
+        for line_number, line in enumerate(fp, start=1):
+            if line.strip():
+                try:
+                    op = json.loads(line)
+                except ValueError as error:
+                    op = InvalidOp(f"Invalid JSON: {error}")
+                else:
+                    if not isinstance(op, dict):
+                        op = InvalidOp("Op must be a JSON object")
+                yield line_number, op
+
+
+def _run_op(cli, stdout: ThreadLocalStdout, line_number, op):
+    if isinstance(op, InvalidOp):
+        return {"line": line_number, "ok": False, "error": op.error}
+
+    name = op.get("op")
+    args = op.get("args") or {}
+    record = {"line": line_number, "op": name}
+    if "id" in op:
+        record["id"] = op["id"]
+
+    start = time.time()
+    stdout.capture()
+    try:
+        method = getattr(cli, name, None) if name else None
+        if not callable(method) or name.startswith("_") or name in EXCLUDED_OPS:
+            raise Exception(f"Unsupported op '{name}'")
+        if isinstance(args, list):
+            method(*args)
+        else:
+            method(**args)
+        record["ok"] = True
+    except (Exception, SystemExit) as exception:
+        record["ok"] = False
+        record["error"] = str(exception)
+    output = stdout.release()
+    record["elapsed"] = round(time.time() - start, 3)
+
+    record["output"] = output
+    try:
+        record["result"] = json.loads(output)
+    except ValueError:
+        pass
+    return record
+
+
+def iter_run_ops(cli, ops, concurrency=DEFAULT_CONCURRENCY, ordered=False):
+    """
+    Runs (line_number, op) items on cli with a pool of concurrency worker threads, where each op
+    is {"op": <CLI method>, "args": {...} or [...], "id": <optional tag>}. Yields a record per
+    op with its captured output, in input order if ordered, otherwise as ops complete.
+
+    At most a few ops per worker are read ahead of the records being consumed. Output from
+    threads not running an op goes to stderr, so stdout only holds what the caller prints.
+    """
+    stdout = ThreadLocalStdout(sys.stdout, sys.stderr)
+    previous, sys.stdout = sys.stdout, stdout
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            if ordered:
+                window = deque()
+                for line_number, op in ops:
+                    window.append(
+                        executor.submit(_run_op, cli, stdout, line_number, op)
+                    )
+                    if len(window) >= concurrency * 2:
+                        yield window.popleft().result()
+                while window:
+                    yield window.popleft().result()
+            else:
+                pending = set()
+                for line_number, op in ops:
+                    pending.add(executor.submit(_run_op, cli, stdout, line_number, op))
+                    if len(pending) >= concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+    finally:
+        sys.stdout = previous
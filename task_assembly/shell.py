@@ -0,0 +1,242 @@
+import cmd
+import contextlib
+import io
+import json
+import os
+import shlex
+import socket
+import socketserver
+import sys
+import traceback
+
+from .caching import default_cache_dir
+
+
+def socket_path(profile="default"):
+    return str(default_cache_dir().joinpath(f"daemon-{profile}.sock"))
+
+
+def _run_line(cli, parser, argv, secret_cache=None):
+    """
+    Parses and runs one command against the shared client, returning its exit code
+    """
+    from .cli import LOCAL_COMMANDS, run_command
+
+    try:
+        args = parser.parse_args(argv)
+    except SystemExit as exit_:
+        return exit_.code or 0
+    if args.command in LOCAL_COMMANDS:
+        print(f"'{args.command}' can't be run from the shell")
+        return 1
+    try:
+        run_command(cli, args, secret_cache)
+    except SystemExit as exit_:
+        return exit_.code or 0
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class AssemblyShell(cmd.Cmd):
+    """
+    Interactive shell that runs the CLI commands over a single client, so the token and the
+    connection pool stay warm between commands
+    """
+
+    intro = "Task Assembly shell, type a command (e.g. get_tasks) or 'exit' to quit"
+    prompt = "task-assembly> "
+
+    def __init__(self, cli, parser, secret_cache=None):
+        super().__init__()
+        self.cli = cli
+        self.parser = parser
+        self.secret_cache = secret_cache
+
+    def default(self, line):
+        try:
+            argv = shlex.split(line)
+        except ValueError as error:
+            print(error)
+            return
+        _run_line(self.cli, self.parser, argv, self.secret_cache)
+
+    def do_help(self, arg):
+        _run_line(self.cli, self.parser, [arg, "--help"] if arg else ["--help"])
+
+    def do_exit(self, arg):
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        print()
+        return True
+
+    def emptyline(self):
+        pass
+
+
+def run_shell(cli, parser, secret_cache=None):
+    try:
+        AssemblyShell(cli, parser, secret_cache).cmdloop()
+    except KeyboardInterrupt:
+        print()
+
+
+class _FrameWriter(io.TextIOBase):
+    """
+    Sends everything written to it back to the forwarding process as {stream: text} lines
+    """
+
+    def __init__(self, wfile, stream):
+        self.wfile = wfile
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if text:
+            self.wfile.write(json.dumps({self.stream: text}).encode() + b"\n")
+        return len(text)
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _DaemonHandler(socketserver.StreamRequestHandler):
+    def _runs_here(self, request):
+        """
+        Whether the daemon can run the request: a command other than the local ones, for the
+        same profile and response cache setting the daemon was started with
+        """
+        server = self.server
+        _, _, command = _global_options(request["argv"])
+        return (
+            command is not None
+            and command not in server.local_commands
+            and request.get("profile", "default") == server.profile
+            and bool(request.get("cache")) == server.cache
+        )
+
+    def handle(self):
+        server = self.server
+        request = json.loads(self.rfile.readline())
+        argv = request["argv"]
+
+        cwd = os.getcwd()
+        stdout = _FrameWriter(self.wfile, "out")
+        stderr = _FrameWriter(self.wfile, "err")
+        try:
+            os.chdir(request.get("cwd", cwd))
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                if not self._runs_here(request):
+                    exit_code = None
+                else:
+                    exit_code = _run_line(
+                        server.cli, server.parser, argv, server.secret_cache
+                    )
+        finally:
+            os.chdir(cwd)
+        frame = {"local": True} if exit_code is None else {"exit": exit_code}
+        self.wfile.write(json.dumps(frame).encode() + b"\n")
+
+
+class _DaemonServer(socketserver.UnixStreamServer):
+    #   Requests are handled one at a time because each one changes into the caller's directory
+    def __init__(self, path, cli, parser, secret_cache, profile, cache):
+        from .cli import LOCAL_COMMANDS
+
+        self.cli = cli
+        self.parser = parser
+        self.secret_cache = secret_cache
+        self.profile = profile
+        self.cache = cache
+        self.local_commands = LOCAL_COMMANDS
+        super().__init__(path, _DaemonHandler)
+
+
+def run_daemon(cli, parser, path, secret_cache=None, profile="default", cache=False):
+    """
+    Serves CLI commands forwarded over a Unix socket until interrupted. Invocations with
+    TASK_ASSEMBLY_DAEMON set are sent here instead of starting a client of their own, unless
+    they ask for another profile or response cache setting than the daemon's.
+    """
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(path)
+            raise Exception(f"A daemon is already listening on {path}")
+        except ConnectionRefusedError:
+            os.remove(path)
+
+    old_umask = os.umask(0o177)
+    try:
+        server = _DaemonServer(path, cli, parser, secret_cache, profile, cache)
+    finally:
+        os.umask(old_umask)
+    print(f"Task Assembly daemon listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+
+
+def _global_options(argv):
+    """
+    Returns (profile, cache, command) from the options before the subcommand, which is where
+    the parser takes --profile and --cache. command is None if there is no subcommand.
+    """
+    profile = "default"
+    cache = False
+    i = 0
+    while i < len(argv) and argv[i].startswith("-"):
+        arg = argv[i]
+        if arg == "--profile" and i + 1 < len(argv):
+            profile = argv[i + 1]
+            i += 1
+        elif arg.startswith("--profile="):
+            profile = arg.split("=", 1)[1]
+        elif arg == "--cache":
+            cache = True
+        else:
+            #   e.g. --help, which the daemon doesn't handle
+            return profile, cache, None
+        i += 1
+    return profile, cache, argv[i] if i < len(argv) else None
+
+
+def forward_to_daemon(argv, path="1"):
+    """
+    Runs the command on the daemon for the profile, or the daemon at path, and returns its exit
+    code. Returns None when no daemon is running or the command has to run locally.
+    """
+    profile, cache, _ = _global_options(argv)
+    if path == "1":
+        path = socket_path(profile)
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+    except OSError:
+        return None
+
+    with sock, sock.makefile("rwb") as stream:
+        request = {"argv": argv, "cwd": os.getcwd(), "profile": profile, "cache": cache}
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        for line in stream:
+            frame = json.loads(line)
+            if "out" in frame:
+                sys.stdout.write(frame["out"])
+            elif "err" in frame:
+                sys.stderr.write(frame["err"])
+            elif "local" in frame:
+                return None
+            else:
+                return frame["exit"]
+    return None
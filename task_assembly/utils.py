@@ -1,7 +1,10 @@
+import functools
+import gzip
+import inspect
 import os
+import tempfile
 import uuid
 import warnings
-import yaml
 from codecs import encode
 from html import escape
 import mimetypes
@@ -9,6 +12,7 @@ import mimetypes
 BATCH_DEFINITION_ARG_MAP = {
     "account_id": "accountId",
     "blueprint_id": "blueprintId",
+    "input_key": "inputKey",
 }
 
 TASK_DEFINITION_ARG_MAP = {
@@ -44,6 +48,32 @@ REV_BLUEPRINT_DEFINITION_ARG_MAP = {
     v: k for k, v in BLUEPRINT_DEFINITION_ARG_MAP.items()
 }
 
+#   Batch fields shown by list_batches and watch, with their column headers. A dotted key reads
+#   a field of a nested object.
+BATCH_FIELDS = {
+    "Id": "Id",
+    "Name": "Name",
+    "State": "State",
+    "Created": "Created",
+    "CreatedCount": "Count",
+    "CompletedCount": "Completed",
+    "StateCounts.Success": "Successful",
+}
+
+
+def batch_row(batch):
+    """
+    Flattens a batch into a row with a value for each of BATCH_FIELDS
+    """
+    row = {}
+    for k in BATCH_FIELDS:
+        if "." in k:
+            outer, inner = k.split(".")
+            row[k] = (batch.get(outer) or {}).get(inner)
+        else:
+            row[k] = batch.get(k)
+    return row
+
 """
 TASK_DEFINITION_ARG_MAP = {
     "definition_id": "DefinitionId",
@@ -77,6 +107,105 @@ REV_TASK_DEFINITION_ARG_MAP = {v: k for k, v in TASK_DEFINITION_ARG_MAP.items()}
 REV_TASK_DEFINITION_ARG_MAP = {}
 
 
+class RequestParamsBuilder:
+    """
+    Maps the arguments of a client method to request parameters using one of the *_ARG_MAP
+    dictionaries. The method signature and key map are compiled once, so building the
+    parameters for a call only visits the arguments that were actually passed.
+
+    An argument is sent if it was passed, even as None, or if its default isn't None. A key map
+    value can be a dictionary to collect arguments into a nested object.
+    """
+
+    __slots__ = ("signature", "_names", "_targets", "_base", "_nested")
+
+    def __init__(self, function, key_map):
+        signature = inspect.signature(function)
+        #   Drop self and the params argument that the builder supplies
+        parameters = [
+            p for p in list(signature.parameters.values())[1:] if p.name != "params"
+        ]
+        self.signature = signature.replace(
+            parameters=[next(iter(signature.parameters.values()))] + parameters
+        )
+
+        targets = {}
+        for k, i in key_map.items():
+            if isinstance(i, dict):
+                for kk, ii in i.items():
+                    targets[kk] = (k, ii)
+            else:
+                targets[k] = (None, i)
+        self._names = tuple(
+            p.name
+            for p in parameters
+            if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+        )
+        self._targets = {
+            p.name: targets[p.name] for p in parameters if p.name in targets
+        }
+        self._nested = tuple(k for k, i in key_map.items() if isinstance(i, dict))
+
+        self._base = {k: {} for k in self._nested}
+        for p in parameters:
+            if p.name in self._targets and p.default not in (p.empty, None):
+                self._set(self._base, self._targets[p.name], p.default)
+
+    @staticmethod
+    def _set(params, target, value):
+        outer, key = target
+        if outer is None:
+            params[key] = value
+        else:
+            params[outer][key] = value
+
+    def build(self, args, kwargs):
+        params = self._base.copy()
+        for outer in self._nested:
+            params[outer] = params[outer].copy()
+        targets = self._targets
+        for name, value in zip(self._names, args):
+            target = targets.get(name)
+            if target is not None:
+                self._set(params, target, value)
+        for name, value in kwargs.items():
+            target = targets.get(name)
+            if target is not None:
+                self._set(params, target, value)
+        return params
+
+
+def request_params(key_map):
+    """
+    Decorator for client methods that take a keyword-only params argument. The parameters are
+    built from the call's arguments by a RequestParamsBuilder compiled when the method is
+    defined, so concurrent calls never share state.
+    """
+
+    def decorator(function):
+        builder = RequestParamsBuilder(function, key_map)
+
+        if inspect.iscoroutinefunction(function):
+
+            @functools.wraps(function)
+            async def inner(self, *args, **kwargs):
+                params = builder.build(args, kwargs)
+                return await function(self, *args, params=params, **kwargs)
+
+        else:
+
+            @functools.wraps(function)
+            def inner(self, *args, **kwargs):
+                return function(
+                    self, *args, params=builder.build(args, kwargs), **kwargs
+                )
+
+        inner.__signature__ = builder.signature
+        return inner
+
+    return decorator
+
+
 def display_iframe(url=None, html=None, width=None, height=600, frame_border=5):
     frame_id = "f" + str(uuid.uuid4())[:8]
     w = 900 if width is None else width
@@ -131,41 +260,199 @@ def display_link(url, prefix):
     )
 
 
-def prepare_file_upload(post_response, file_name):
-    dataList = []
-    boundary = "wL36Yn8afVp8Ag7AmP8qZ0SA4n1v9T"
+#   Connection pool defaults, pool_maxsize is the per-host connection limit
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
 
-    dataList.append(encode("--" + boundary))
-    dataList.append(encode("Content-Disposition: form-data; name=key;"))
-    dataList.append(encode("Content-Type: {}".format("text/plain")))
-    dataList.append(encode(""))
-    dataList.append(encode(post_response["url"]["fields"]["key"]))
+#   Worker threads used by the bulk methods
+DEFAULT_CONCURRENCY = 8
 
-    dataList.append(encode("--" + boundary))
-    dataList.append(encode("Content-Disposition: form-data; name=AWSAccessKeyId;"))
-    dataList.append(encode("Content-Type: {}".format("text/plain")))
-    dataList.append(encode(""))
-    dataList.append(encode(post_response["url"]["fields"]["AWSAccessKeyId"]))
+MULTIPART_BOUNDARY = "wL36Yn8afVp8Ag7AmP8qZ0SA4n1v9T"
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+PRESIGNED_POST_FIELDS = [
+    "key",
+    "AWSAccessKeyId",
+    "x-amz-security-token",
+    "policy",
+    "signature",
+]
 
-    dataList.append(encode("--" + boundary))
-    dataList.append(
-        encode("Content-Disposition: form-data; name=x-amz-security-token;")
-    )
-    dataList.append(encode("Content-Type: {}".format("text/plain")))
-    dataList.append(encode(""))
-    dataList.append(encode(post_response["url"]["fields"]["x-amz-security-token"]))
+#   Filename suffix and content type used for each supported upload compression
+COMPRESSION_TYPES = {
+    "gzip": (".gz", "application/gzip"),
+    "zstd": (".zst", "application/zstd"),
+}
 
-    dataList.append(encode("--" + boundary))
-    dataList.append(encode("Content-Disposition: form-data; name=policy;"))
-    dataList.append(encode("Content-Type: {}".format("text/plain")))
-    dataList.append(encode(""))
-    dataList.append(encode(post_response["url"]["fields"]["policy"]))
 
-    dataList.append(encode("--" + boundary))
-    dataList.append(encode("Content-Disposition: form-data; name=signature;"))
-    dataList.append(encode("Content-Type: {}".format("text/plain")))
-    dataList.append(encode(""))
-    dataList.append(encode(post_response["url"]["fields"]["signature"]))
+class MultipartFileBody:
+    """
+    A multipart/form-data body that streams the file from disk in UPLOAD_CHUNK_SIZE chunks.
+    The length is known up front so requests sends it with a Content-Length header rather than
+    chunked encoding, which presigned S3 POSTs don't accept.
+
+    If a hasher (e.g. hashlib.sha256()) is provided it is updated with the file content as it is
+    sent. With remove_on_close the file is deleted when the body is closed, which is used for
+    temporary compressed copies.
+    """
+
+    def __init__(
+        self,
+        preamble: bytes,
+        file_name,
+        epilogue: bytes,
+        chunk_size=None,
+        hasher=None,
+        remove_on_close=False,
+    ):
+        self.file_name = file_name
+        self.chunk_size = chunk_size if chunk_size else UPLOAD_CHUNK_SIZE
+        self.hasher = hasher
+        self.remove_on_close = remove_on_close
+        self.file_size = os.path.getsize(file_name)
+        self._preamble = preamble
+        self._epilogue = epilogue
+        self._length = len(preamble) + self.file_size + len(epilogue)
+        self._fp = None
+        self._stage = 0
+        self._pending = b""
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = self._next(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def _next(self, size):
+        if self._pending:
+            chunk, self._pending = self._pending[:size], self._pending[size:]
+            return chunk
+        if self._stage == 0:
+            self._stage = 1
+            self._pending = self._preamble
+            self._fp = open(self.file_name, "rb")
+            return self._next(size)
+        if self._stage == 1:
+            chunk = self._fp.read(min(size, self.chunk_size))
+            if chunk:
+                return self._file_chunk(chunk)
+            self._fp.close()
+            self._stage = 2
+            self._pending = self._epilogue
+            return self._next(size)
+        return b""
+
+    def _file_chunk(self, chunk):
+        if self.hasher is not None:
+            self.hasher.update(chunk)
+        return chunk
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+        if self.remove_on_close:
+            remove_file(self.file_name)
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise Exception(
+            "zstd compression requires zstandard, install it with 'pip install task-assembly[zstd]'"
+        )
+    return zstandard
+
+
+def check_compression(compression):
+    """
+    Raises if the compression isn't supported or its library isn't installed, so callers can
+    fail before creating anything on the service
+    """
+    if compression not in COMPRESSION_TYPES:
+        raise Exception(
+            f"Unsupported compression {compression}, use one of {list(COMPRESSION_TYPES)}"
+        )
+    if compression == "zstd":
+        _zstandard()
+
+
+def _compressor(compression, fp):
+    if compression == "gzip":
+        # mtime=0 keeps the output identical for identical input
+        return gzip.GzipFile(fileobj=fp, mode="wb", mtime=0)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().stream_writer(fp, closefd=False)
+
+
+def compress_file(file_name, compression, hasher=None, chunk_size=None):
+    """
+    Compresses the file chunk by chunk into a temporary file and returns its name. The hasher,
+    if provided, is updated with the uncompressed content.
+
+    Presigned POSTs need the length of the body up front, so the compressed copy is written to
+    disk rather than being compressed while it is sent.
+    """
+    check_compression(compression)
+    chunk_size = chunk_size if chunk_size else UPLOAD_CHUNK_SIZE
+    fd, compressed_name = tempfile.mkstemp(suffix=COMPRESSION_TYPES[compression][0])
+    try:
+        with open(file_name, "rb") as src, os.fdopen(fd, "wb") as dst:
+            with _compressor(compression, dst) as writer:
+                for chunk in iter(lambda: src.read(chunk_size), b""):
+                    if hasher is not None:
+                        hasher.update(chunk)
+                    writer.write(chunk)
+    except BaseException:
+        remove_file(compressed_name)
+        raise
+    return compressed_name
+
+
+def prepare_file_upload(post_response, file_name, hasher=None, compression=None):
+    dataList = []
+    boundary = MULTIPART_BOUNDARY
+
+    upload_name = file_name
+    fileType = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    if compression:
+        #   The source is hashed while it is compressed, the suffix and type tell the
+        #   service how the file is encoded
+        upload_name = compress_file(file_name, compression, hasher)
+        hasher = None
+        suffix, fileType = COMPRESSION_TYPES[compression]
+        file_name = file_name + suffix
+
+    for field in PRESIGNED_POST_FIELDS:
+        dataList.append(encode("--" + boundary))
+        dataList.append(
+            encode("Content-Disposition: form-data; name={};".format(field))
+        )
+        dataList.append(encode("Content-Type: {}".format("text/plain")))
+        dataList.append(encode(""))
+        dataList.append(encode(post_response["url"]["fields"][field]))
 
     dataList.append(encode("--" + boundary))
     dataList.append(
@@ -173,17 +460,25 @@ def prepare_file_upload(post_response, file_name):
             "Content-Disposition: form-data; name=file; filename={0}".format(file_name)
         )
     )
-    fileType = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
     dataList.append(encode("Content-Type: {}".format(fileType)))
     dataList.append(encode(""))
-
-    with open(file_name, "rb") as f:
-        dataList.append(f.read())
-    dataList.append(encode("--" + boundary + "--"))
     dataList.append(encode(""))
-    body = b"\r\n".join(dataList)
+    preamble = b"\r\n".join(dataList)
+    epilogue = b"\r\n".join([encode(""), encode("--" + boundary + "--"), encode("")])
+
+    #   The file is streamed from disk when the body is sent
+    body = MultipartFileBody(
+        preamble,
+        upload_name,
+        epilogue,
+        hasher=hasher,
+        remove_on_close=bool(compression),
+    )
 
-    headers = {"Content-type": "multipart/form-data; boundary={}".format(boundary)}
+    headers = {
+        "Content-type": "multipart/form-data; boundary={}".format(boundary),
+        "Content-Length": str(len(body)),
+    }
 
     #   Upload file
     file_e = post_response["url"]["url"]
@@ -192,6 +487,8 @@ def prepare_file_upload(post_response, file_name):
 
 
 def load_yaml(filename):
+    import yaml
+
     with open(filename, "r") as ffp:
         definition_ = yaml.safe_load(ffp)
     return definition_
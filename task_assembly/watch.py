@@ -0,0 +1,110 @@
+import heapq
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .caching import TERMINAL_STATES, ResponseCache
+from .utils import BATCH_FIELDS, DEFAULT_CONCURRENCY, batch_row
+
+DEFAULT_MIN_INTERVAL = 5
+DEFAULT_MAX_INTERVAL = 300
+#   Interval multiplier after a poll that found no change
+BACKOFF = 1.5
+
+
+class BatchWatcher:
+    """
+    Polls a set of batches concurrently over the client's connection pool. Each batch has its
+    own interval, reset to min_interval when its status changes and stretched by BACKOFF, up to
+    max_interval, each time it doesn't. Polls are conditional requests through an in-memory
+    response cache with no TTL, so an unchanged batch costs a 304. Batches stop being polled
+    once they reach a terminal state.
+    """
+
+    def __init__(
+        self,
+        client,
+        batch_ids,
+        min_interval=DEFAULT_MIN_INTERVAL,
+        max_interval=DEFAULT_MAX_INTERVAL,
+        concurrency=DEFAULT_CONCURRENCY,
+    ):
+        self.client = client
+        self.batch_ids = list(dict.fromkeys(batch_ids))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.concurrency = concurrency
+        self.cache = ResponseCache(ttl=0, persist=False)
+        self.rows = {batch_id: {"Id": batch_id} for batch_id in self.batch_ids}
+        self.intervals = {batch_id: min_interval for batch_id in self.batch_ids}
+
+    def _poll(self, batch_id):
+        try:
+            return batch_row(self.client.get_batch(batch_id, response_cache=self.cache))
+        except Exception as exception:
+            return {"Id": batch_id, "State": f"Error - {exception}"}
+
+    def _update(self, batch_id, row):
+        """
+        Records a poll result and returns whether the batch's status changed
+        """
+        changed = row != self.rows[batch_id]
+        self.rows[batch_id] = row
+        if changed:
+            self.intervals[batch_id] = self.min_interval
+        else:
+            self.intervals[batch_id] = min(
+                self.intervals[batch_id] * BACKOFF, self.max_interval
+            )
+        return changed
+
+    def iter_changes(self):
+        """
+        Polls until every batch is in a terminal state, yielding the rows after each round of
+        polls that changed at least one of them
+        """
+        schedule = [(0, batch_id) for batch_id in self.batch_ids]
+        heapq.heapify(schedule)
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+            while schedule or pending:
+                now = time.monotonic()
+                while schedule and schedule[0][0] <= now:
+                    _, batch_id = heapq.heappop(schedule)
+                    pending[executor.submit(self._poll, batch_id)] = batch_id
+
+                timeout = max(schedule[0][0] - now, 0) if schedule else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                changed = False
+                for future in done:
+                    batch_id = pending.pop(future)
+                    row = future.result()
+                    changed |= self._update(batch_id, row)
+                    if row.get("State") not in TERMINAL_STATES:
+                        heapq.heappush(
+                            schedule,
+                            (time.monotonic() + self.intervals[batch_id], batch_id),
+                        )
+                if changed:
+                    yield [self.rows[batch_id] for batch_id in self.batch_ids]
+
+
+def watch_batches(client, batch_ids, out=None, **kwargs):
+    """
+    Redraws a status table for the batches each time one of them changes
+    """
+    from tabulate import tabulate
+
+    out = out or sys.stdout
+    redraw = out.isatty()
+    for rows in BatchWatcher(client, batch_ids, **kwargs).iter_changes():
+        table = [[row.get(k) for k in BATCH_FIELDS] for row in rows]
+        if redraw:
+            out.write("\x1b[H\x1b[J")
+        out.write(time.strftime("%H:%M:%S") + "\n")
+        out.write(tabulate(table, headers=list(BATCH_FIELDS.values())) + "\n\n")
+        out.flush()
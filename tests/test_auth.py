@@ -0,0 +1,128 @@
+import builtins
+import threading
+import time
+
+import yaml
+
+from task_assembly import auth
+from task_assembly.auth import REFRESH_TOKEN_LEWAY, TOKEN_URL, TokenProvider
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def json(self):
+        return dict(self.data)
+
+
+class StubSession:
+    """
+    Answers /oauth/token with a new token, after delay seconds
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.posts = []
+        self.posted = threading.Event()
+        self.lock = threading.Lock()
+
+    def post(self, url, headers=None, data=None):
+        with self.lock:
+            self.posts.append((url, time.time()))
+            count = len(self.posts)
+        time.sleep(self.delay)
+        self.posted.set()
+        return StubResponse(
+            {
+                "access_token": f"new-{count}",
+                "refresh_token": "refresh",
+                "expires_in": 3600,
+            }
+        )
+
+
+def write_token(path, refresh_in, access_token="old"):
+    """
+    Writes a token due for refresh in refresh_in seconds
+    """
+    with open(path, "w") as fp:
+        yaml.dump(
+            {
+                "access_token": access_token,
+                "refresh_token": "refresh",
+                "token_issued_at": time.time(),
+                "expires_in": REFRESH_TOKEN_LEWAY + refresh_in,
+            },
+            fp,
+        )
+
+
+def test_stale_token_is_refreshed_once(tmp_path):
+    token_file = tmp_path / "token.yaml"
+    write_token(token_file, refresh_in=-1)
+    session = StubSession(delay=0.1)
+    provider = TokenProvider(session, str(token_file), background_refresh=False)
+
+    threads_count = 16
+    barrier = threading.Barrier(threads_count, timeout=5)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(provider.get_token())
+
+    threads = [threading.Thread(target=get) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [url for url, _ in session.posts] == [TOKEN_URL]
+    assert results == [{"token": "new-1"}] * threads_count
+
+
+def test_background_refresh_fires_before_the_leeway(tmp_path):
+    token_file = tmp_path / "token.yaml"
+    write_token(token_file, refresh_in=0.3)
+    expires_at = time.time() + REFRESH_TOKEN_LEWAY + 0.3
+    session = StubSession()
+    provider = TokenProvider(session, str(token_file))
+    try:
+        assert provider.get_token() == {"token": "old"}
+        assert session.posts == []
+        assert session.posted.wait(5)
+        _, posted_at = session.posts[0]
+        assert posted_at <= expires_at - REFRESH_TOKEN_LEWAY + 1
+        assert provider.get_token() == {"token": "new-1"}
+        assert len(session.posts) == 1
+    finally:
+        provider.close()
+
+
+def test_fresh_token_is_served_from_memory(tmp_path, monkeypatch):
+    token_file = tmp_path / "token.yaml"
+    write_token(token_file, refresh_in=3600)
+    session = StubSession()
+    provider = TokenProvider(session, str(token_file), background_refresh=False)
+    assert provider.get_token() == {"token": "old"}
+
+    touched = []
+    real_open = builtins.open
+    real_isfile = auth.os.path.isfile
+
+    def open_(file, *args, **kwargs):
+        touched.append(str(file))
+        return real_open(file, *args, **kwargs)
+
+    def isfile(path):
+        touched.append(str(path))
+        return real_isfile(path)
+
+    monkeypatch.setattr(builtins, "open", open_)
+    monkeypatch.setattr(auth.os.path, "isfile", isfile)
+    monkeypatch.setattr(auth, "load_yaml", lambda path: touched.append(path))
+    for _ in range(10000):
+        assert provider.get_token() == {"token": "old"}
+    assert touched == []
+    assert session.posts == []
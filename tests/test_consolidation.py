@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from task_assembly.consolidation import (  # noqa: E402
+    ResponseSet,
+    consolidate,
+    majority_vote,
+    threshold_agreement,
+)
+
+
+def consolidate_result(event, context):
+    """
+    The example consolidation handler, from the legacy example in
+    task_assembly/example/handlers.py
+    """
+    scored_values = {}
+    for response in event.get("Responses"):
+        value = str(response["Result"]["value"]).lower().strip()
+        if not value.isnumeric():
+            scored_values[value] = scored_values.get(value, 0) + 1
+    for response, score in scored_values.items():
+        if score >= 2:
+            return {"value": response}
+    return {"extend": True}
+
+
+def handler_results(tasks):
+    return {
+        task: consolidate_result(
+            {"Responses": [{"Result": {"value": v}} for v in values]}, None
+        )
+        for task, values in tasks.items()
+    }
+
+
+def responses_for(tasks):
+    task_ids = [task for task, values in tasks.items() for _ in values]
+    values = [value for values in tasks.values() for value in values]
+    return ResponseSet.from_arrays(
+        task_ids, values, ignore=lambda value: value.isnumeric()
+    )
+
+
+def test_tie_accepts_first_value_given():
+    result = dict(
+        threshold_agreement(responses_for({"t": ["a", "a", "b", "b"]})).results()
+    )
+    assert result == {"t": {"value": "a"}}
+
+
+def test_first_qualifying_value_beats_larger_count():
+    tasks = {"t": ["b", "a", "a", "b", "b"]}
+    assert dict(threshold_agreement(responses_for(tasks)).results()) == handler_results(
+        tasks
+    )
+
+
+def test_matches_example_handler():
+    rng = random.Random(0)
+    choices = ["a", "A ", "b", "c", " C", "1", "22"]
+    tasks = {
+        f"t{i}": [rng.choice(choices) for _ in range(rng.randint(1, 6))]
+        for i in range(2000)
+    }
+    consolidation = consolidate(responses_for(tasks), "threshold")
+    assert dict(consolidation.results()) == handler_results(tasks)
+
+
+def test_unhashable_values_are_compared_as_strings():
+    responses = ResponseSet.from_arrays(
+        ["t", "t", "t"], [["a", "b"], ["A", "B"], {"x": 1}]
+    )
+    result = dict(majority_vote(responses).results())
+    assert result == {"t": {"value": "['a', 'b']"}}
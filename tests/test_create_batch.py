@@ -0,0 +1,114 @@
+import sys
+
+import pytest
+import requests
+
+from task_assembly.cli import CLI
+
+
+class StubResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.ok = status_code < 400
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+class StubSession:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def post(self, url, data=None, headers=None):
+        data.read()
+        return StubResponse(self.status_code)
+
+
+class StubClient:
+    def __init__(self, status_code=204):
+        self.batches = []
+        self.session = StubSession(status_code)
+
+    def create_batch(self, **params):
+        self.batches.append(params)
+        fields = (
+            "key",
+            "AWSAccessKeyId",
+            "x-amz-security-token",
+            "policy",
+            "signature",
+        )
+        return {
+            "Id": "b1",
+            "url": {
+                "url": "https://upload.example",
+                "fields": {field: "value" for field in fields},
+            },
+        }
+
+    def get_session(self):
+        return self.session
+
+
+@pytest.fixture
+def batch_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    file = tmp_path / "batch.jsonl"
+    file.write_text('{"a": 1}\n')
+    return str(file)
+
+
+def test_missing_compressor_fails_before_creating_batch(batch_file, monkeypatch):
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    client = StubClient()
+    with pytest.raises(Exception, match="zstandard"):
+        CLI(client).create_batch("bp", "acct", batch_file, compress="zstd")
+    assert client.batches == []
+
+
+def test_unknown_compression_fails_before_creating_batch(batch_file):
+    client = StubClient()
+    with pytest.raises(Exception, match="Unsupported compression"):
+        CLI(client).create_batch("bp", "acct", batch_file, compress="lzma")
+    assert client.batches == []
+
+
+def test_failed_upload_is_reported(batch_file, capsys):
+    client = StubClient(status_code=403)
+    with pytest.raises(requests.HTTPError):
+        CLI(client).create_batch("bp", "acct", batch_file, compress="gzip")
+    assert "Uploaded file" not in capsys.readouterr().out
+
+
+def test_successful_upload(batch_file, capsys):
+    CLI(StubClient()).create_batch("bp", "acct", batch_file)
+    assert "Uploaded file" in capsys.readouterr().out
+
+
+def test_file_is_only_hashed_when_reusing_uploads(batch_file, monkeypatch):
+    from task_assembly.caching import UploadCache
+
+    CLI(StubClient()).create_batch("bp", "acct", batch_file)
+    #   Changed content isn't indexed by path, so a lookup would have to hash it
+    with open(batch_file, "a") as fp:
+        fp.write('{"a": 2}\n')
+    hashed = []
+    hash_file = UploadCache._hash_file
+    monkeypatch.setattr(
+        UploadCache,
+        "_hash_file",
+        staticmethod(
+            lambda file_name: hashed.append(file_name) or hash_file(file_name)
+        ),
+    )
+
+    client = StubClient()
+    CLI(client).create_batch("bp", "acct", batch_file)
+    assert hashed == []
+    assert "input_key" not in client.batches[0]
+
+    with open(batch_file, "a") as fp:
+        fp.write('{"a": 3}\n')
+    CLI(StubClient()).create_batch("bp", "acct", batch_file, reuse_upload=True)
+    assert hashed == [batch_file]
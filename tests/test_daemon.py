@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from task_assembly.cli import build_parser
+from task_assembly.shell import _DaemonServer, _global_options, forward_to_daemon
+
+
+class StubClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_blueprint(self, id):
+        self.calls.append(id)
+        return {"Id": id}
+
+
+class StubCLI:
+    def __init__(self):
+        self.client = StubClient()
+
+    def _save_snapshot(self, fields):
+        pass
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    servers = []
+
+    def start(profile="default", cache=False):
+        cli = StubCLI()
+        server = _DaemonServer(
+            str(tmp_path / "daemon.sock"), cli, build_parser(), None, profile, cache
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server.server_address, cli
+
+    #   The daemon redirects the process's stdout while it runs a command, so the commands
+    #   forwarded here write to a file instead of printing
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_global_options():
+    assert _global_options(["get_blueprint", "shell"]) == (
+        "default",
+        False,
+        "get_blueprint",
+    )
+    assert _global_options(["--profile", "prod", "--cache", "get_tasks"]) == (
+        "prod",
+        True,
+        "get_tasks",
+    )
+    assert _global_options(["--profile=prod", "shell"]) == ("prod", False, "shell")
+    assert _global_options(["--help"]) == ("default", False, None)
+    assert _global_options([]) == ("default", False, None)
+
+
+def test_runs_command_for_matching_profile(daemon, tmp_path):
+    path, cli = daemon(profile="prod")
+    definition_file = str(tmp_path / "definition.yaml")
+    argv = ["--profile", "prod", "get_blueprint", "bp-1"]
+    assert forward_to_daemon(argv + ["--definition_file", definition_file], path) == 0
+    assert cli.client.calls == ["bp-1"]
+    assert "bp-1" in open(definition_file).read()
+
+
+def test_positional_value_named_like_a_local_command(daemon, tmp_path):
+    path, cli = daemon()
+    definition_file = str(tmp_path / "definition.yaml")
+    argv = ["get_blueprint", "shell", "--definition_file", definition_file]
+    assert forward_to_daemon(argv, path) == 0
+    assert cli.client.calls == ["shell"]
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["--profile", "other", "get_blueprint", "bp-1"],
+        ["--cache", "get_blueprint", "bp-1"],
+        ["configure"],
+        ["--profile", "prod", "shell"],
+        [],
+    ],
+)
+def test_refuses_commands_it_cannot_run(daemon, argv):
+    path, cli = daemon(profile="prod")
+    if argv and argv[0] != "--profile":
+        argv = ["--profile", "prod"] + argv
+    assert forward_to_daemon(argv, path) is None
+    assert cli.client.calls == []
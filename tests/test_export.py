@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet  # noqa: E402
+
+from task_assembly.export import export_results, iter_result_tables  # noqa: E402
+
+
+def lines(records):
+    return [json.dumps(record).encode() + b"\n" for record in records]
+
+
+def read_parquet(tmp_path, records, block_bytes):
+    from task_assembly.export import export_columnar
+
+    output_file = str(tmp_path / "results.parquet")
+    count = export_columnar(lines(records), output_file, block_bytes=block_bytes)
+    assert count == len(records)
+    return pa.parquet.read_table(output_file)
+
+
+def test_null_column_gets_values_in_later_block(tmp_path):
+    records = [{"Data": {"a": None}, "Result": {"value": "x"}}] * 20 + [
+        {"Data": {"a": "text"}, "Result": {"value": "y"}}
+    ] * 20
+    table = read_parquet(tmp_path, records, block_bytes=200)
+    assert table.schema.field("Data.a").type == pa.string()
+    assert table.column("Data.a").to_pylist()[-1] == "text"
+
+
+def test_int_promoted_to_float(tmp_path):
+    records = [{"Data": {"n": 1}}] * 20 + [{"Data": {"n": 1.5}}] * 20
+    table = read_parquet(tmp_path, records, block_bytes=200)
+    assert table.schema.field("Data.n").type == pa.float64()
+    assert table.column("Data.n").to_pylist()[-1] == 1.5
+
+
+def test_fields_first_seen_in_later_block_are_kept(tmp_path):
+    records = [{"Data": {"a": i}} for i in range(50)] + [
+        {"Data": {"a": i}, "Result": {"value": "done"}} for i in range(50)
+    ]
+    table = read_parquet(tmp_path, records, block_bytes=1000)
+    assert "Result.value" in table.column_names
+    values = table.column("Result.value").to_pylist()
+    assert values[0] is None and values[-1] == "done"
+
+
+def test_blocks_are_inferred_separately():
+    records = [{"Data": {"a": None}}] * 20 + [{"Data": {"a": "x"}}] * 20
+    types = {
+        table.schema.field("Data.a").type
+        for table in iter_result_tables(lines(records), block_bytes=200)
+    }
+    assert pa.null() in types and pa.string() in types
+
+
+def test_declared_schema(tmp_path):
+    schema = pa.schema([("Data", pa.struct([("n", pa.float64())]))])
+    records = [{"Data": {"n": 1}, "Result": {"value": "x"}}]
+    tables = list(iter_result_tables(lines(records), schema=schema))
+    assert tables[0].schema.field("Data.n").type == pa.float64()
+    assert "Result.value" in tables[0].column_names
+
+
+def test_export_results_dispatches_to_columnar(tmp_path):
+    output_file = str(tmp_path / "results.feather")
+    assert export_results(lines([{"Data": {"a": 1}}]), output_file) == 1
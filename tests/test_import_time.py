@@ -0,0 +1,39 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+#   Cumulative import time budget for task_assembly.cli, in microseconds. Importing it took
+#   about 40ms once heavy imports were deferred, against about 570ms before.
+IMPORT_BUDGET_US = 150_000
+DEFERRED_MODULES = ["larry", "boto3", "yaml", "toml", "rich", "requests"]
+
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def test_cli_import_time():
+    stderr = run_python("-X", "importtime", "-c", "import task_assembly.cli").stderr
+    cumulative = [
+        int(line.split("|")[1])
+        for line in stderr.splitlines()
+        if line.startswith("import time:")
+        and line.split("|")[2].strip() == "task_assembly.cli"
+    ]
+    assert cumulative, stderr
+    assert cumulative[0] < IMPORT_BUDGET_US
+
+
+def test_cli_import_defers_heavy_modules():
+    stdout = run_python(
+        "-c",
+        "import json, sys, task_assembly.cli; "
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))",
+    ).stdout
+    assert json.loads(stdout) == []
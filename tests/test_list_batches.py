@@ -0,0 +1,64 @@
+from task_assembly.cli import CLI, _parse_created
+
+
+class StubClient:
+    def __init__(self, batches):
+        self.batches = batches
+
+    def iter_batches(self):
+        return iter(self.batches)
+
+
+def batches(*days, offset=""):
+    return [
+        {"Id": f"b{day}", "Created": f"2024-01-{day:02d}T00:00:00{offset}"}
+        for day in days
+    ]
+
+
+def listed_ids(capsys, batches, **kwargs):
+    CLI(StubClient(batches)).list_batches(**kwargs)
+    lines = capsys.readouterr().out.splitlines()[2:]
+    return [line.split()[0] for line in lines]
+
+
+def test_limit_reads_every_page(capsys):
+    assert listed_ids(capsys, batches(3, 1, 20, 25), limit=1) == ["b25"]
+
+
+def test_since_does_not_stop_at_first_old_batch(capsys):
+    assert listed_ids(capsys, batches(2, 20, 25), since="2024-01-10") == [
+        "b25",
+        "b20",
+    ]
+
+
+def test_since_compares_with_offset_timestamps(capsys):
+    ids = listed_ids(
+        capsys, batches(2, 20, 25, offset="+02:00"), since="2024-01-10T00:00:00Z"
+    )
+    assert ids == ["b25", "b20"]
+
+
+def test_parse_created_is_always_aware():
+    assert _parse_created("2024-01-10").tzinfo is not None
+    assert _parse_created("2024-01-10T00:00:00Z") == _parse_created(
+        "2024-01-10T00:00:00+00:00"
+    )
+
+
+def test_batch_row_flattens_nested_counts():
+    from task_assembly.utils import BATCH_FIELDS, batch_row
+    from task_assembly.watch import BatchWatcher
+
+    batch = {"Id": "b1", "State": "Processing", "StateCounts": {"Success": 3}}
+
+    class Client:
+        def get_batch(self, batch_id, response_cache=None):
+            return batch
+
+    row = batch_row(batch)
+    assert list(row) == list(BATCH_FIELDS)
+    assert row["StateCounts.Success"] == 3
+    assert batch_row({"Id": "b2", "StateCounts": None})["StateCounts.Success"] is None
+    assert BatchWatcher(Client(), ["b1"])._poll("b1") == row
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from task_assembly import cli
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv(cli.DAEMON_ENV, raising=False)
+    return tmp_path
+
+
+def test_mirror_query_runs_without_configuration(home, capsys):
+    cli.main(["mirror", "query", "batches", "--db", str(home / "mirror.db")])
+    assert json.loads(capsys.readouterr().out) == []
+
+
+def test_estimate_reliability_runs_without_configuration(home, capsys):
+    pytest.importorskip("numpy")
+    assignments = home / "assignments.jsonl"
+    assignments.write_text(
+        "\n".join(
+            json.dumps({"TaskId": task, "WorkerId": worker, "Result": "a"})
+            for task in ("t-1", "t-2")
+            for worker in ("w-1", "w-2")
+        )
+    )
+    cli.main(["estimate_reliability", str(assignments)])
+    assert "Estimated 2 workers over 2 tasks" in capsys.readouterr().out
+
+
+def test_online_commands_still_need_configuration(home, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["get_batches"])
+    assert "No configuration file found" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+import json
+import threading
+
+from botocore.exceptions import ClientError
+
+from task_assembly.qualifications import QualificationProgress, assign_qualification
+
+
+def test_appends_after_a_partially_written_line(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    path.write_text(
+        json.dumps({"QualificationTypeId": "q-1"})
+        + "\n"
+        + json.dumps({"WorkerId": "w-1"})
+        + "\n"
+        + '{"WorkerId": "w-'
+    )
+    progress = QualificationProgress(path)
+    assert progress.assigned == {"w-1"}
+
+    progress.start("q-1")
+    progress.record("w-2")
+    progress.close()
+
+    resumed = QualificationProgress(path)
+    assert resumed.qualification_id == "q-1"
+    assert resumed.assigned == {"w-1", "w-2"}
+
+
+def test_new_file(tmp_path):
+    path = tmp_path / "qualifications" / "progress.jsonl"
+    progress = QualificationProgress(path)
+    progress.start("q-1")
+    progress.record("w-1")
+    progress.close()
+
+    assert path.read_text().splitlines() == [
+        json.dumps({"QualificationTypeId": "q-1"}),
+        json.dumps({"WorkerId": "w-1"}),
+    ]
+
+
+class StubMTurkClient:
+    """
+    Fails each worker's first calls with the error codes given for it
+    """
+
+    def __init__(self, errors=None):
+        self.errors = {worker: list(codes) for worker, codes in (errors or {}).items()}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def associate_qualification_with_worker(self, **kwargs):
+        worker_id = kwargs["WorkerId"]
+        with self.lock:
+            self.calls.append(worker_id)
+            codes = self.errors.get(worker_id)
+            code = codes.pop(0) if codes else None
+        if code:
+            raise ClientError(
+                {"Error": {"Code": code, "Message": code}},
+                "AssociateQualificationWithWorker",
+            )
+
+
+def test_throttled_requests_are_retried():
+    mturk = StubMTurkClient({"w-1": ["Throttling", "ThrottlingException"]})
+    report = assign_qualification(
+        "q-1", ["w-1", "w-2"], mturk_client=mturk, retry_delay=0
+    )
+    assert report.assigned == 2
+    assert report.failures == {}
+    assert mturk.calls.count("w-1") == 3
+
+
+def test_throttling_gives_up_after_max_attempts():
+    mturk = StubMTurkClient({"w-1": ["Throttling"] * 5})
+    report = assign_qualification(
+        "q-1", ["w-1"], mturk_client=mturk, max_attempts=3, retry_delay=0
+    )
+    assert mturk.calls.count("w-1") == 3
+    assert list(report.failures) == ["w-1"]
+    assert "Throttling" in report.failures["w-1"]
+
+
+def test_other_errors_fail_only_that_worker(tmp_path):
+    mturk = StubMTurkClient({"w-2": ["RequestError"]})
+    progress = QualificationProgress(tmp_path / "progress.jsonl")
+    report = assign_qualification(
+        "q-1",
+        ["w-1", "w-2", "w-3"],
+        progress=progress,
+        mturk_client=mturk,
+        retry_delay=0,
+    )
+    assert list(report.failures) == ["w-2"]
+    assert mturk.calls.count("w-2") == 1
+    assert report.assigned == 2
+    assert QualificationProgress(progress.path).assigned == {"w-1", "w-3"}
+
+
+def test_recorded_workers_are_skipped(tmp_path):
+    path = tmp_path / "progress.jsonl"
+    progress = QualificationProgress(path)
+    progress.start("q-1")
+    progress.record("w-1")
+    progress.close()
+
+    mturk = StubMTurkClient()
+    report = assign_qualification(
+        "q-1",
+        ["w-1", "w-2", "w-3", "w-2"],
+        progress=QualificationProgress(path),
+        mturk_client=mturk,
+        retry_delay=0,
+    )
+    assert sorted(mturk.calls) == ["w-2", "w-3"]
+    assert (report.assigned, report.skipped) == (2, 1)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0] == {"QualificationTypeId": "q-1"}
+    assert sorted(record["WorkerId"] for record in records[1:]) == ["w-1", "w-2", "w-3"]
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from task_assembly.consolidation import ResponseSet, majority_vote  # noqa: E402
+from task_assembly.reliability import estimate_reliability  # noqa: E402
+
+
+def assignments(responses):
+    return [
+        {"TaskId": task, "WorkerId": worker, "Result": value}
+        for task, votes in responses.items()
+        for worker, value in votes.items()
+    ]
+
+
+def test_ignored_values_are_not_candidate_labels():
+    reliability = estimate_reliability(
+        assignments(
+            {
+                "t-1": {"w-1": "a", "w-2": "a", "w-3": None},
+                "t-2": {"w-1": "b", "w-2": "b", "w-3": "b"},
+            }
+        )
+    )
+    assert sorted(reliability.values) == ["a", "b"]
+    assert reliability.confusion.shape == (3, 2, 2)
+    assert np.allclose(reliability.posteriors.sum(axis=1), 1)
+
+
+def test_tasks_without_votes_are_left_out():
+    reliability = estimate_reliability(
+        assignments(
+            {
+                "t-1": {"w-1": "a", "w-2": "a"},
+                "t-2": {"w-1": None, "w-2": None},
+            }
+        )
+    )
+    assert dict(reliability.results()) == {"t-1": {"value": "a"}}
+    assert [label["TaskId"] for label in reliability.task_labels()] == ["t-1"]
+    assert len(reliability.tasks) == 2
+
+
+def test_recovers_labels_and_ranks_reliable_workers():
+    rng = random.Random(0)
+    labels = ["a", "b", "c"]
+    accuracies = {"good-1": 0.9, "good-2": 0.85, "good-3": 0.8, "good-4": 0.9}
+    spammers = ["spam-1", "spam-2", "spam-3"]
+    truth = {f"t-{i}": rng.choice(labels) for i in range(500)}
+    records = []
+    for task, label in truth.items():
+        for worker in rng.sample(list(accuracies) + spammers, 5):
+            if worker in accuracies and rng.random() < accuracies[worker]:
+                value = label
+            elif worker in accuracies:
+                value = rng.choice([other for other in labels if other != label])
+            else:
+                value = rng.choice(labels)
+            records.append({"TaskId": task, "WorkerId": worker, "Result": value})
+
+    reliability = estimate_reliability(records)
+    scores = {row["WorkerId"]: row["Score"] for row in reliability.worker_scores()}
+    assert min(scores[worker] for worker in accuracies) > max(
+        scores[worker] for worker in spammers
+    )
+    for worker, accuracy in accuracies.items():
+        assert abs(scores[worker] - accuracy * 100) < 10
+
+    def correct(results):
+        return sum(
+            results.get(task) == {"value": label} for task, label in truth.items()
+        )
+
+    majority = dict(majority_vote(ResponseSet.from_assignments(records)).results())
+    estimated = correct(dict(reliability.results()))
+    assert estimated / len(truth) > 0.9
+    assert estimated > correct(majority)
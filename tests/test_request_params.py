@@ -0,0 +1,59 @@
+import threading
+
+from task_assembly.client import AssemblyClient
+from task_assembly.utils import request_params
+
+THREADS = 8
+CALLS = 500
+
+
+def test_concurrent_update_blueprint_params_do_not_leak():
+    client = AssemblyClient("key")
+    #   Every thread waits here on each call, so calls from different threads are in flight
+    #   at the same time
+    barrier = threading.Barrier(THREADS, timeout=10)
+
+    def put(url, data=None):
+        barrier.wait()
+        return url, dict(data)
+
+    client.put = put
+    failures = []
+
+    def run(n):
+        try:
+            calls(n)
+        except Exception as e:
+            failures.append((n, e))
+            barrier.abort()
+
+    def calls(n):
+        for i in range(CALLS):
+            kwargs = {"blueprint_id": f"bp{n}", "title": f"title {n} {i}"}
+            if n % 2:
+                kwargs["max_assignments"] = i
+            else:
+                kwargs["state"] = None
+            url, params = client.update_blueprint(**kwargs)
+            expected = {"title": f"title {n} {i}"}
+            expected.update({"maxAssignments": i} if n % 2 else {"state": None})
+            if url != client.ENDPOINT + f"/blueprint/bp{n}" or params != expected:
+                failures.append((n, i, url, params))
+
+    threads = [threading.Thread(target=run, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == []
+
+
+def test_params_from_defaults_positional_and_explicit_none():
+    @request_params({"a": "A", "b": "B", "c": "C", "d": {"e": "E"}})
+    def method(self, a, b=None, c=3, e=None, *, params):
+        return params
+
+    assert method(None, 1) == {"A": 1, "C": 3, "d": {}}
+    assert method(None, 1, b=None, e=5) == {"A": 1, "B": None, "C": 3, "d": {"E": 5}}
+    #   Nested objects aren't shared between calls
+    assert method(None, 1) == {"A": 1, "C": 3, "d": {}}
@@ -0,0 +1,27 @@
+from task_assembly.caching import ResponseCache
+
+
+def test_single_finished_object_is_permanent(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    entry = cache.put("/batch/b1", {"Id": "b1", "State": "Completed"})
+    assert entry["permanent"]
+    assert cache.is_fresh(entry)
+
+
+def test_running_object_expires(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    entry = cache.put("/batch/b1", {"Id": "b1", "State": "Processing"})
+    assert not cache.is_fresh(entry)
+
+
+def test_list_of_finished_items_expires(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    entry = cache.put("/batch", [{"State": "Completed"}, {"State": "Expired"}])
+    assert not entry["permanent"]
+    assert not cache.is_fresh(entry)
+
+
+def test_page_of_finished_items_expires(tmp_path):
+    cache = ResponseCache(tmp_path, ttl=0)
+    entry = cache.put("/task?StartKey=k", {"Tasks": [{"State": "Completed"}]})
+    assert not cache.is_fresh(entry)
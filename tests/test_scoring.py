@@ -0,0 +1,30 @@
+import math
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from task_assembly.scoring import GoldSet  # noqa: E402
+
+
+def score(gold, value):
+    report = GoldSet([{"Data": {"q": 1}, "Result": gold}]).score(
+        [{"Data": {"q": 1}, "Result": {"value": value}, "WorkerId": "w"}]
+    )
+    return report.scores[0]
+
+
+def test_score_response_rules():
+    assert score("Salt and Pepper", "salt and pepper") == 100
+    assert score("salt and pepper", "salt pepper") == 80
+    assert score("well-known", "well known") == 80
+    assert score("yes", "no") == 0
+
+
+def test_unscored_values():
+    for value in (None, "", 0, []):
+        assert math.isnan(score("yes", value))
+
+
+def test_unhashable_values():
+    assert score("['a', 'b']", ["A", "B"]) == 100
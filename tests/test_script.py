@@ -0,0 +1,59 @@
+import json
+import threading
+
+from task_assembly.cli import CLI
+
+
+class StubCLI:
+    run = CLI.run
+
+    def get_task(self, task_id):
+        print(json.dumps({"TaskId": task_id}))
+
+
+def test_malformed_lines_are_reported_and_the_run_continues(tmp_path, capsys):
+    ops_file = tmp_path / "ops.jsonl"
+    ops_file.write_text(
+        "\n".join(
+            [
+                json.dumps({"op": "get_task", "args": {"task_id": "t-1"}}),
+                '{"op": "get_task", "args": ',
+                "[1, 2]",
+                json.dumps({"op": "get_task", "args": ["t-2"]}),
+            ]
+        )
+        + "\n"
+    )
+    StubCLI().run(str(ops_file), concurrency=2, ordered=True)
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+
+    assert [record["line"] for record in records] == [1, 2, 3, 4]
+    assert [record["ok"] for record in records] == [True, False, False, True]
+    assert records[1]["error"].startswith("Invalid JSON")
+    assert records[2]["error"] == "Op must be a JSON object"
+    assert records[3]["result"] == {"TaskId": "t-2"}
+    assert "Ran 4 ops (2 failed)" in captured.err
+
+
+def test_output_of_other_threads_goes_to_stderr(tmp_path, capsys):
+    class BackgroundCLI(StubCLI):
+        def refresh(self):
+            #   Like TokenProvider's background refresh on its Timer thread
+            timer = threading.Timer(0, print, args=("using refresh token",))
+            timer.start()
+            timer.join()
+
+    ops_file = tmp_path / "ops.jsonl"
+    ops_file.write_text(
+        json.dumps({"op": "refresh"})
+        + "\n"
+        + json.dumps({"op": "get_task", "args": ["t-1"]})
+        + "\n"
+    )
+    BackgroundCLI().run(str(ops_file), concurrency=2, ordered=True)
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [record["ok"] for record in records] == [True, True]
+    assert records[0]["output"] == ""
+    assert "using refresh token" in captured.err
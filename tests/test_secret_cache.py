@@ -0,0 +1,143 @@
+import argparse
+import json
+
+import pytest
+from apiclient.exceptions import ClientError
+
+from task_assembly import caching
+from task_assembly.caching import SecretCache
+from task_assembly.cli import load_config, run_command
+
+
+class StubSecretsClient:
+    def __init__(self, value="key-1"):
+        self.value = value
+        self.calls = 0
+
+    def get_secret_value(self, SecretId):
+        self.calls += 1
+        return {"SecretString": json.dumps({"api_key": self.value})}
+
+
+@pytest.fixture
+def config(tmp_path):
+    def write(**credentials):
+        path = tmp_path / "config.toml"
+        lines = ["[default.credentials]"]
+        lines += [f"{k} = {json.dumps(v)}" for k, v in credentials.items()]
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    return write
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(caching.time, "time", lambda: now[0])
+    return now
+
+
+def test_ttl_hit(tmp_path, config, clock):
+    ta_config = config(api_key_secret="secret")
+    cache = SecretCache(tmp_path / "secrets.json", ttl=60)
+    secrets = StubSecretsClient()
+    for _ in range(3):
+        assert load_config(ta_config, "default", cache, secrets) == "key-1"
+        clock[0] += 10
+    assert secrets.calls == 1
+
+
+def test_ttl_expiry(tmp_path, config, clock):
+    ta_config = config(api_key_secret="secret")
+    cache = SecretCache(tmp_path / "secrets.json", ttl=60)
+    secrets = StubSecretsClient()
+    load_config(ta_config, "default", cache, secrets)
+    clock[0] += 61
+    secrets.value = "key-2"
+    assert load_config(ta_config, "default", cache, secrets) == "key-2"
+    assert secrets.calls == 2
+
+
+def test_profile_ttl_zero_disables_cache(tmp_path, config):
+    ta_config = config(api_key_secret="secret", api_key_secret_ttl=0)
+    cache = SecretCache(tmp_path / "secrets.json", ttl=60)
+    secrets = StubSecretsClient()
+    load_config(ta_config, "default", cache, secrets)
+    load_config(ta_config, "default", cache, secrets)
+    assert secrets.calls == 2
+    assert not cache.path.exists()
+
+
+def test_file_mode(tmp_path, config):
+    cache = SecretCache(tmp_path / "secrets.json")
+    load_config(config(api_key_secret="secret"), "default", cache, StubSecretsClient())
+    assert cache.path.stat().st_mode & 0o777 == 0o600
+
+
+@pytest.mark.parametrize("status_code", [401, 403])
+def test_rejected_key_invalidates_cache(tmp_path, config, status_code):
+    ta_config = config(api_key_secret="secret")
+    cache = SecretCache(tmp_path / "secrets.json")
+    secrets = StubSecretsClient()
+    load_config(ta_config, "default", cache, secrets)
+
+    def rejected(cli):
+        raise ClientError("Unauthorized", status_code=status_code)
+
+    args = argparse.Namespace(
+        func=rejected, command="get_batches", profile=None, cache=False
+    )
+    with pytest.raises(ClientError):
+        run_command(None, args, cache)
+    assert not cache.path.exists()
+    load_config(ta_config, "default", cache, secrets)
+    assert secrets.calls == 2
+
+
+def test_other_errors_keep_cache(tmp_path, config):
+    cache = SecretCache(tmp_path / "secrets.json")
+    load_config(config(api_key_secret="secret"), "default", cache, StubSecretsClient())
+
+    def missing(cli):
+        raise ClientError("Not found", status_code=404)
+
+    args = argparse.Namespace(
+        func=missing, command="get_batch", profile=None, cache=False
+    )
+    with pytest.raises(ClientError):
+        run_command(None, args, cache)
+    assert cache.path.exists()
+
+
+def test_invalidate_one_secret(tmp_path, clock):
+    cache = SecretCache(tmp_path / "secrets.json")
+    cache.get("a", lambda s: "A")
+    cache.get("b", lambda s: "B")
+    cache.invalidate("a")
+    assert cache.get("a", lambda s: "A2") == "A2"
+    assert cache.get("b", lambda s: "B2") == "B"
+
+
+def test_profiles_sharing_a_secret_name(tmp_path, clock):
+    ta_config = tmp_path / "config.toml"
+    ta_config.write_text(
+        '[dev.credentials]\napi_key_secret = "task-assembly/api-key"\n'
+        '[prod.credentials]\napi_key_secret = "task-assembly/api-key"\n'
+    )
+    cache = SecretCache(tmp_path / "secrets.json", ttl=60)
+    dev = StubSecretsClient("dev-key")
+    prod = StubSecretsClient("prod-key")
+    for _ in range(2):
+        assert load_config(ta_config, "dev", cache, dev) == "dev-key"
+        assert load_config(ta_config, "prod", cache, prod) == "prod-key"
+    assert (dev.calls, prod.calls) == (1, 1)
+
+
+def test_invalidate_one_scope(tmp_path, clock):
+    cache = SecretCache(tmp_path / "secrets.json")
+    cache.get("a", lambda s: "dev", scope="dev")
+    cache.get("a", lambda s: "prod", scope="prod")
+    cache.invalidate("a", scope="dev")
+    assert cache.get("a", lambda s: "dev2", scope="dev") == "dev2"
+    assert cache.get("a", lambda s: "prod2", scope="prod") == "prod"
@@ -0,0 +1,78 @@
+import os
+import threading
+from pathlib import Path
+
+from task_assembly.caching import UploadCache, _read_json, _write_json
+
+
+def test_concurrent_writes_to_one_file(tmp_path):
+    path = tmp_path / "data.json"
+    errors = []
+
+    def write(n):
+        for i in range(300):
+            try:
+                _write_json(path, {"writer": n, "i": i})
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert set(_read_json(path, {})) == {"writer", "i"}
+    assert os.listdir(tmp_path) == ["data.json"]
+
+
+def test_write_json_mode(tmp_path):
+    path = tmp_path / "secret.json"
+    _write_json(path, {}, mode=0o600)
+    assert path.stat().st_mode & 0o777 == 0o600
+
+
+def test_concurrent_records_are_all_kept(tmp_path):
+    index = tmp_path / "uploads.json"
+    files = []
+    for n in range(16):
+        file = tmp_path / f"{n}.jsonl"
+        file.write_text(f"{n}\n")
+        files.append(file)
+
+    def record(n):
+        UploadCache(index).record(files[n], f"sha{n}", f"key{n}", "url")
+
+    threads = [threading.Thread(target=record, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(_read_json(index, {})["objects"]) == 16
+
+
+def test_lookup_matches_content_at_another_path(tmp_path):
+    import hashlib
+
+    index = tmp_path / "uploads.json"
+    original = tmp_path / "a.jsonl"
+    original.write_text('{"a": 1}\n')
+    sha256 = hashlib.sha256(original.read_bytes()).hexdigest()
+    UploadCache(index).record(original, sha256, "key", "url")
+
+    copy = tmp_path / "b.jsonl"
+    copy.write_bytes(original.read_bytes())
+    assert UploadCache(index).lookup(copy)["key"] == "key"
+
+    os.utime(original, ns=(0, 0))
+    assert UploadCache(index).lookup(original)["key"] == "key"
+    assert UploadCache(index).lookup(original, encoding="gzip") is None
+
+    copy.write_text('{"a": 2}\n')
+    assert UploadCache(index).lookup(copy) is None
+
+
+def test_lookup_without_index(tmp_path):
+    file = tmp_path / "a.jsonl"
+    file.write_text("{}\n")
+    assert UploadCache(Path(tmp_path / "uploads.json")).lookup(file) is None